@@ -0,0 +1,165 @@
+import io
+import os
+import json
+import time
+import hashlib
+import argparse
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from canvas import B2A
+
+# == Manifest (read_manifest) ==
+
+def read_manifest(path: str, domain=None) -> list:
+    """
+    [{user, token, domain}] from a manifest with one user per line:
+    a bare API token, or a JSON object {"token": ..., "user": ..., "domain": ...} (user and domain optional)
+    users without an id are keyed by a hash of their token, so tokens never end up in outputs or checkpoints
+    """
+    entries = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if (line == '') or line.startswith('#'):
+                continue
+            entry = json.loads(line) if line.startswith('{') else {'token': line}
+            if entry.get('domain', domain) == None:
+                raise Exception("No Canvas domain for a manifest entry (use --domain or a \"domain\" field).")
+            entries.append({'user': str(entry.get('user') or hashlib.sha256(entry['token'].encode()).hexdigest()[:16]),
+                            'token': entry['token'], 'domain': entry.get('domain', domain)})
+    return entries
+
+# == Rate limit (GlobalRateLimit) ==
+
+class GlobalRateLimit:
+    """
+    Paces requests across every worker process to at most rate per second (B2A rate_limiter)
+    the next free request slot lives in shared memory, so it must be created before the pool and passed to the workers
+    """
+    def __init__(self, rate: float) -> None:
+        self.interval = 1. / rate
+        self.next = multiprocessing.Value('d', 0.)
+
+    def wait(self) -> None:
+        with self.next.get_lock():
+            now = time.time()
+            slot = max(now, self.next.value)
+            self.next.value = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+# == Workers (_init_worker, _stage_user) ==
+
+_session = None # pooled session of this worker process, reused for every user it stages
+_limiter = None
+_options = None
+
+def _init_worker(limiter, options: dict) -> None:
+    global _session, _limiter, _options
+    _session = requests.Session()
+    _session.mount('https://', HTTPAdapter(pool_connections=options['threads'], pool_maxsize=options['threads']))
+    _limiter = limiter
+    _options = options
+
+def _stage_user(entry: dict) -> dict:
+    """
+    Stages every accessible course of one user and appends the result to this worker's output
+    {user, ok, courses, requests, seconds, error}
+    """
+    start = time.perf_counter()
+    b = B2A(entry['domain'], entry['token'], workers=_options['threads'], rate_limiter=_limiter)
+    b.session = _session
+    b.session.headers['Authorization'] = "Bearer " + entry['token']
+    result = {'user': entry['user'], 'ok': True, 'courses': 0, 'requests': 0, 'seconds': 0., 'error': None}
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            course_ids = [id for id, course in b.course_index().items() if course['access_removed'] != True]
+            b.stage_courses(course_ids)
+        write_staged(b, entry['user'], _options['out'], _options['format'])
+        result['courses'] = len(course_ids)
+    except Exception as e:
+        result['ok'] = False
+        result['error'] = str(e)
+    result['requests'] = b.request_count
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def write_staged(b: B2A, user: str, out: str, fmt: str) -> None:
+    """
+    jsonl: one record {user, courses: {course_id: self.dir entry}, assignments, synced} appended to this process's part file
+    snapshot: <user>.npz written with save_snapshot
+    a user restaged after an interrupted run can appear twice in the part files, the last record wins
+    """
+    if fmt == 'snapshot':
+        b.save_snapshot(os.path.join(out, f"{user}.npz"))
+        return
+    record = {'user': user, 'courses': b.dir, 'assignments': b.assignments, 'synced': b.synced}
+    with open(os.path.join(out, f"staged-{os.getpid()}.jsonl"), 'a') as f:
+        f.write(json.dumps(record) + "\n")
+
+# == Batch (run, main) ==
+
+def run(entries: list, out: str, processes=None, threads=4, rate=None, fmt='jsonl') -> dict:
+    """
+    Stages the users of a manifest on a process pool, writing into the directory out
+    users are checkpointed in out/checkpoint.txt as they finish, so a rerun skips them; failures go to out/failures.jsonl
+    {users, skipped, staged, failed, courses, requests, seconds, users_per_s, requests_per_s}
+    """
+    os.makedirs(out, exist_ok=True)
+    checkpoint = os.path.join(out, 'checkpoint.txt')
+    done = set()
+    if os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            done = {line.strip() for line in f if line.strip() != ''}
+    todo = [entry for entry in entries if entry['user'] not in done]
+
+    summary = {'users': len(entries), 'skipped': len(entries) - len(todo), 'staged': 0, 'failed': 0, 'courses': 0, 'requests': 0}
+    start = time.perf_counter()
+    limiter = GlobalRateLimit(rate) if rate else None
+    options = {'threads': threads, 'out': out, 'format': fmt}
+    with open(checkpoint, 'a') as checkpoints, open(os.path.join(out, 'failures.jsonl'), 'a') as failures:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(limiter, options)) as executor:
+            for future in as_completed([executor.submit(_stage_user, entry) for entry in todo]):
+                result = future.result()
+                summary['requests'] += result['requests']
+                if result['ok']:
+                    summary['staged'] += 1
+                    summary['courses'] += result['courses']
+                    checkpoints.write(result['user'] + "\n")
+                    checkpoints.flush()
+                else:
+                    summary['failed'] += 1
+                    failures.write(json.dumps(result) + "\n")
+                    failures.flush()
+
+    seconds = time.perf_counter() - start
+    summary['seconds'] = seconds
+    summary['users_per_s'] = (summary['staged'] + summary['failed']) / seconds if seconds > 0 else None
+    summary['requests_per_s'] = summary['requests'] / seconds if seconds > 0 else None
+    return summary
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stage every course of many Canvas users from a token manifest.")
+    parser.add_argument('manifest', help="one API token or JSON {\"token\", \"user\", \"domain\"} per line")
+    parser.add_argument('--domain', help="Canvas domain for entries without one, e.g. canvas.school.edu")
+    parser.add_argument('--out', default='staged', help="output directory (also holds the checkpoint)")
+    parser.add_argument('--format', default='jsonl', choices=['jsonl', 'snapshot'])
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--threads', type=int, default=4, help="concurrent requests per process")
+    parser.add_argument('--rate', type=float, default=50, help="max requests per second across all processes (0 for no limit)")
+    parser.add_argument('--json', action='store_true', help="print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = run(read_manifest(args.manifest, args.domain), args.out, args.processes, args.threads, args.rate, args.format)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{summary['staged']} users staged, {summary['failed']} failed, {summary['skipped']} skipped (checkpointed) of {summary['users']}")
+    print(f"{summary['courses']} courses, {summary['requests']} requests in {summary['seconds']:.1f}s")
+    print(f"{summary['users_per_s'] or 0:.2f} users/s, {summary['requests_per_s'] or 0:.1f} requests/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+import io
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import tracemalloc
+import contextlib
+from urllib.parse import urlparse, parse_qs, urlencode
+import requests
+from requests.adapters import BaseAdapter
+from canvas import B2A, PathwayTrace
+
+# == Synthetic courses (synthetic_course) ==
+
+SIZES = {
+    # (grade groups, assignments per group)
+    'small': (4, 10),
+    'medium': (6, 40),
+    'huge': (10, 400),
+}
+
+def synthetic_course(course_id: int, size='small', seed=0, graded=0.6) -> dict:
+    """
+    {course, groups, submissions} in the shape the Canvas API returns them
+    graded is the share of assignments that already have a score
+    """
+    n_groups, n_assignments = SIZES[size]
+    rnd = random.Random(seed * 1000 + course_id)
+    weights = [rnd.randint(1, 10) for _ in range(n_groups)]
+    weights = [round(w / sum(weights) * 100, 2) for w in weights]
+
+    groups = []
+    submissions = []
+    for g in range(n_groups):
+        group_id = course_id * 1000 + g
+        skill = rnd.uniform(0.6, 0.95) # student's average in this group
+        assignments = []
+        for i in range(n_assignments):
+            assignment_id = group_id * 10000 + i
+            points = rnd.choice([5, 10, 20, 50, 100])
+            assignments.append({'id': assignment_id, 'assignment_group_id': group_id, 'name': f"Assignment {g}.{i}", 'points_possible': points,
+                                'due_at': f"2026-{1 + i * 11 // n_assignments:02d}-15T23:59:00Z", 'description': "<p>" + "lorem ipsum " * 20 + "</p>"})
+            score = None
+            if i < n_assignments * graded:
+                score = round(min(1., max(0., rnd.gauss(skill, 0.1))) * points, 1)
+            submissions.append({'assignment_id': assignment_id, 'user_id': 1, 'score': score, 'grade': None if score == None else str(score),
+                                'workflow_state': 'unsubmitted' if score == None else 'graded', 'graded_at': None if score == None else '2026-01-01T00:00:00Z'})
+        groups.append({'id': group_id, 'name': f"Group {g}", 'group_weight': weights[g], 'assignments': assignments})
+
+    course = {'id': course_id, 'name': f"Course {course_id} ({size})", 'apply_assignment_group_weights': True,
+              'enrollments': [{'computed_current_score': round(rnd.uniform(70, 95), 2)}]}
+    return {'course': course, 'groups': groups, 'submissions': submissions}
+
+# == Fake Canvas (FakeCanvas) ==
+
+class FakeCanvas(BaseAdapter):
+    """
+    requests transport adapter answering the Canvas endpoints B2A uses from synthetic courses
+    mount it on B2A.session; pages follow per_page with Link headers, every response waits latency seconds
+    """
+    def __init__(self, courses: list, latency=0., max_per_page=100) -> None:
+        super().__init__()
+        self.courses = {c['course']['id']: c for c in courses}
+        self.latency = latency
+        self.max_per_page = max_per_page
+        self.requests = 0
+
+    def send(self, request, **kwargs) -> requests.Response:
+        self.requests += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        url = urlparse(request.url)
+        query = parse_qs(url.query)
+        status, items, paginated = self.route(url.path, query)
+
+        r = requests.Response()
+        r.status_code = status
+        r.url = request.url
+        r.request = request
+        if paginated:
+            per_page = min(int(query.get('per_page', ['10'])[0]), self.max_per_page)
+            page = int(query.get('page', ['1'])[0])
+            last = max(1, -(-len(items) // per_page))
+            links = {'current': page, 'first': 1, 'last': last}
+            if page < last:
+                links['next'] = page + 1
+            base = {k: v for k, v in query.items() if k != 'page'}
+            r.headers['Link'] = ','.join(f'<{url.scheme}://{url.netloc}{url.path}?{urlencode(dict(base, page=[p]), doseq=True)}>; rel="{rel}"' for rel, p in links.items())
+            items = items[(page - 1) * per_page:page * per_page]
+        r._content = json.dumps(items).encode()
+        r.headers['Content-Type'] = 'application/json'
+        r.headers['ETag'] = hashlib.md5(r._content).hexdigest()
+        if request.headers.get('If-None-Match') == r.headers['ETag']:
+            r.status_code = 304
+            r._content = b''
+        return r
+
+    def route(self, path: str, query: dict) -> tuple:
+        """
+        (status, body, paginated)
+        """
+        if path.endswith('/users/self/courses'):
+            return (200, [c['course'] for c in self.courses.values()], True)
+        m = re.search(r'/courses/(\d+)/', path)
+        course = self.courses.get(int(m.group(1))) if m else None
+        if course == None:
+            return (404, {'errors': [{'message': 'The specified resource does not exist.'}]}, False)
+
+        m = re.search(r'/assignment_groups/(\d+)/assignments$', path)
+        if m:
+            group = next((g for g in course['groups'] if g['id'] == int(m.group(1))), {'assignments': []})
+            return (200, group['assignments'], True)
+        if path.endswith('/assignment_groups'):
+            if 'assignments' in query.get('include[]', []):
+                return (200, course['groups'], True)
+            return (200, [{k: v for k, v in g.items() if k != 'assignments'} for g in course['groups']], True)
+        m = re.search(r'/assignments/(\d+)/submissions/self$', path)
+        if m:
+            submission = next((s for s in course['submissions'] if s['assignment_id'] == int(m.group(1))), None)
+            return (200, submission, False) if submission != None else (404, {}, False)
+        if path.endswith('/students/submissions'):
+            submissions = course['submissions']
+            if 'graded_since' in query:
+                submissions = [s for s in submissions if (s['graded_at'] != None) and (s['graded_at'] > query['graded_since'][0])]
+            return (200, submissions, True)
+        if path.endswith('/enrollments'):
+            return (200, [{'user_id': 1, 'user': {'name': 'Student 1'}}], True)
+        return (404, {}, False)
+
+    def close(self) -> None:
+        pass
+
+# == Benchmark (run, main) ==
+
+def run(size='small', courses=3, latency=0., bulk=True, workers=8, targets=(70, 80, 90), seed=0) -> dict:
+    """
+    Stages `courses` synthetic courses of one size through FakeCanvas and runs pathway on each
+    {staging wall time, requests, peak staging memory, pathway wall time, pathway iterations}
+    """
+    fake = FakeCanvas([synthetic_course(i + 1, size, seed) for i in range(courses)], latency)
+    b = B2A('canvas.test', 'token', bulk=bulk, workers=workers)
+    b.session.mount('https://', fake)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        b.stage_courses(list(range(1, courses + 1)))
+    staging = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    iterations = 0
+    start = time.perf_counter()
+    for course_id in b.dir:
+        for target in targets:
+            trace = PathwayTrace()
+            b.pathway(course_id, target, trace=trace, dashboard=False)
+            iterations += len(trace)
+    pathways = time.perf_counter() - start
+
+    report = {}
+    report['size'] = size
+    report['courses'] = courses
+    report['assignments'] = sum(len(a) for a in b.assignments.values())
+    report['staging_s'] = staging
+    report['requests'] = b.request_count
+    report['peak_mb'] = peak / 2**20
+    report['pathways'] = courses * len(targets)
+    report['pathway_s'] = pathways
+    report['pathway_iterations'] = iterations
+    return report
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark staging and pathway against a local fake Canvas.")
+    parser.add_argument('--sizes', nargs='+', default=list(SIZES), choices=list(SIZES))
+    parser.add_argument('--courses', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds per fake request")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--per-assignment', action='store_true', help="stage with the per-assignment fallback instead of bulk")
+    parser.add_argument('--json', action='store_true', help="print the reports as JSON")
+    args = parser.parse_args()
+
+    reports = [run(size, args.courses, args.latency, not args.per_assignment, args.workers) for size in args.sizes]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    print(f"{'size':>8} {'assignments':>12} {'staging s':>10} {'requests':>9} {'peak MB':>8} {'pathway s':>10} {'iterations':>11}")
+    for r in reports:
+        print(f"{r['size']:>8} {r['assignments']:>12} {r['staging_s']:>10.3f} {r['requests']:>9} {r['peak_mb']:>8.1f} {r['pathway_s']:>10.3f} {r['pathway_iterations']:>11}")
+
+if __name__ == '__main__':
+    main()
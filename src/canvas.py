@@ -1,35 +1,611 @@
 import json
+import re
+import io
+import sys
+import csv
+import html
+import math
+import time
+import zlib
+import random
+import sqlite3
+import hashlib
+import cProfile
+import pstats
+import threading
+from collections import Counter, deque
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
 import numpy as np
 
+class CanvasError(Exception):
+    """
+    GET request to Canvas that failed (after retries), or a course Canvas doesn't give access to (status_code 404/403)
+    """
+    def __init__(self, message: str, status_code=None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+class ResponseCache:
+    """
+    Persistent cache of Canvas GET responses in a SQLite file, keyed by token + URL
+    fresh entries (younger than the endpoint's TTL) are served without a request,
+    stale ones are revalidated with If-None-Match/If-Modified-Since,
+    least recently used entries are evicted once the bodies exceed max_bytes
+    """
+
+    # (url regex, seconds an entry is fresh), first match wins
+    TTLS = [
+        (r'/users/self/courses', 300),
+        (r'/assignment_groups', 300),
+        (r'/submissions', 0),
+    ]
+
+    def __init__(self, path: str, max_bytes=64 * 2**20, ttls=None, default_ttl=60) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in (ttls if ttls != None else self.TTLS)]
+        self.default_ttl = default_ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, url TEXT, headers TEXT, body BLOB, size INTEGER, stored_at REAL, accessed_at REAL)""")
+        self.db.commit()
+
+    def key(self, token: str, url: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()[:16] + ' ' + url
+
+    def ttl(self, url: str) -> float:
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def lookup(self, key: str) -> tuple:
+        """
+        (cached response or None, is fresh)
+        """
+        with self.lock:
+            row = self.db.execute("SELECT url, headers, body, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row == None:
+                return (None, False)
+            self.db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        url, headers, body, stored_at = row
+        r = requests.Response()
+        r.status_code = 200
+        r.url = url
+        r.headers.update(json.loads(headers))
+        r._content = zlib.decompress(body)
+        return (r, time.time() - stored_at < self.ttl(url))
+
+    def validators(self, r: requests.Response) -> dict:
+        """
+        Conditional request headers for revalidating a cached response
+        """
+        headers = {}
+        if 'ETag' in r.headers:
+            headers['If-None-Match'] = r.headers['ETag']
+        if 'Last-Modified' in r.headers:
+            headers['If-Modified-Since'] = r.headers['Last-Modified']
+        return headers
+
+    def store(self, key: str, r: requests.Response) -> None:
+        headers = {k: v for k, v in r.headers.items() if k in ('Link', 'ETag', 'Last-Modified', 'Content-Type')}
+        body = zlib.compress(r.content)
+        now = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)", (key, r.url, json.dumps(headers), body, len(body), now, now))
+            self.evict()
+            self.db.commit()
+
+    def revalidated(self, key: str) -> None:
+        """
+        Server answered 304, the cached entry is fresh again
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            self.db.commit()
+
+    def evict(self) -> None:
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self) -> None:
+        with self.lock:
+            self.db.execute("DELETE FROM responses")
+            self.db.commit()
+
+class PathwayTrace:
+    """
+    Structured record of a pathway search, one step per iteration
+    {iteration, direction ('up'/'down'/'done'), step (which groups moved), deltas {group_id: adj}, calculated_grade}
+    """
+    def __init__(self) -> None:
+        self.steps = []
+
+    def add(self, iteration: int, direction: str, step: str, deltas: dict, calculated_grade: float) -> None:
+        self.steps.append({'iteration': iteration, 'direction': direction, 'step': step, 'deltas': deltas, 'calculated_grade': calculated_grade})
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.steps, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+class GroupModel:
+    """
+    Plain float stats of one staged grade group, read by the algorithm instead of the nested self.dir dicts
+    ceiling, base and rate make B2A.grade_possible closed form, for a group grade g:
+    % needed on the remaining assignments <= 100             <->  g <= ceiling
+    % needed on the remaining assignments <= g + adj + diff  <->  g <= base + rate * (adj + diff)
+    (lowest, highest) are the grade bounds for the default diff, see B2A.grade_bounds:
+    lowest is the group grade with nothing scored on the remaining assignments, the least that can still be achieved
+    """
+    __slots__ = ('position', 'weight', 'current_grade', 'maximum', 'scored', 'possible', 'remaining', 'graded', 'future',
+                 'ceiling', 'base', 'rate', 'lowest', 'highest')
+
+    DIFF = 5. # default slack of grade_possible
+
+    def __init__(self, position: int, info: dict) -> None:
+        self.position = position
+        self.weight = float(info['group_weight'])
+        self.current_grade = info['group_current_grade']
+        self.maximum = info['maximum_points']
+        self.scored = info['scored_points']
+        self.possible = info['possible_points']
+        self.remaining = self.maximum - self.possible
+        self.graded = tuple(info['assignments']['graded'])
+        self.future = tuple(info['assignments']['future'])
+
+        self.ceiling = 100 * (self.remaining + self.scored) / self.maximum if self.maximum > 0 else np.inf
+        self.base = 100 * self.scored / self.possible if self.possible > 0 else np.inf
+        self.rate = self.remaining / self.possible if self.possible > 0 else 0.
+        self.lowest = 100 * self.scored / self.maximum if (self.remaining > 0) & (self.maximum > 0) else 0.
+        self.highest = self.upper(self.DIFF)
+
+    def upper(self, diff: float) -> float:
+        """
+        Highest group grade grade_possible allows (before any adjustment) with slack diff
+        """
+        if (self.remaining <= 0) | (self.maximum <= 0):
+            return 100.
+        return min(100., self.ceiling, self.base + self.rate * diff)
+
+class CourseModel:
+    """
+    Compiled form of self.dir[course_id]['grade_groups'] and self.assignments[course_id], never modified once built
+    groups: {group_id: GroupModel}, plus arrays indexed by GroupModel.position for vectorized code
+    course: the staged course info (self.dir[course_id]) it was built from, assignments: the staged assignments, memo: memoized stats (see B2A.memo)
+    restaging or refreshing a course builds a new model, so a pathway holding this one keeps a consistent view
+    """
+    __slots__ = ('groups', 'ids', 'weights', 'maximum', 'scored', 'possible', 'future', 'lowest', 'highest', 'course', 'assignments', 'memo')
+
+    def __init__(self, grade_groups: dict, assignments=None, course=None) -> None:
+        self.course = course if course != None else {'grade_groups': grade_groups}
+        self.assignments = assignments if assignments != None else {}
+        self.memo = {}
+        self.groups = {id: GroupModel(i, info) for i, (id, info) in enumerate(grade_groups.items())}
+        self.ids = list(self.groups)
+        self.weights = np.array([g.weight for g in self.groups.values()])
+        self.maximum = np.array([g.maximum for g in self.groups.values()])
+        self.scored = np.array([g.scored for g in self.groups.values()])
+        self.possible = np.array([g.possible for g in self.groups.values()])
+        self.future = np.array([len(g.future) for g in self.groups.values()])
+        self.lowest = np.array([g.lowest for g in self.groups.values()])
+        self.highest = np.array([g.highest for g in self.groups.values()])
+
+    def positions(self, ids: list) -> list:
+        return [self.groups[id].position for id in ids]
+
+class Roster:
+    """
+    Instructor view of a course: one shared group/assignment model plus a students x assignments score matrix
+    scores are NaN until a submission is scored, assignments worth no points are left out
+    """
+    def __init__(self, course_id: int, groups: list, assignments: list, students: list) -> None:
+        self.course_id = course_id
+        self.group_ids = [g['group_id'] for g in groups]
+        self.group_names = [g['group_name'] for g in groups]
+        self.weights = np.array([g['group_weight'] for g in groups], dtype=float)
+        group_index = {id: i for i, id in enumerate(self.group_ids)}
+
+        counted = [a for a in assignments if (a['points_possible'] != None) and (a['points_possible'] > 0) and (a['group_id'] in group_index)]
+        self.assignment_ids = [a['assignment_id'] for a in counted]
+        self.assignment_index = {id: i for i, id in enumerate(self.assignment_ids)}
+        self.points = np.array([a['points_possible'] for a in counted], dtype=float)
+        self.membership = np.zeros((len(counted), len(groups)), dtype=np.float32) # assignment x group one-hot
+        self.membership[np.arange(len(counted)), [group_index[a['group_id']] for a in counted]] = 1
+
+        self.student_ids = [s['user_id'] for s in students]
+        self.names = [s['name'] for s in students]
+        self.student_index = {id: i for i, id in enumerate(self.student_ids)}
+        self.scores = np.full((len(students), len(counted)), np.nan, dtype=np.float32)
+        self.cache = {} # group/current grades of all students, cleared by add_submissions
+
+    def add_submissions(self, submissions: list) -> int:
+        """
+        Writes a chunk of submissions into the score matrix, returns how many were used
+        """
+        rows = []
+        cols = []
+        values = []
+        for s in submissions:
+            row = self.student_index.get(s['user_id'])
+            col = self.assignment_index.get(s['assignment_id'])
+            if (row == None) or (col == None) or (s.get('score') == None):
+                continue
+            rows.append(row)
+            cols.append(col)
+            values.append(s['score'])
+        self.scores[rows, cols] = values
+        self.cache.clear()
+        return len(values)
+
+    def group_points(self) -> tuple:
+        """
+        (scored: students x groups, possible: students x groups, maximum: groups)
+        """
+        graded = ~np.isnan(self.scores)
+        scored = np.where(graded, self.scores, 0) @ self.membership
+        possible = (graded * self.points.astype(np.float32)) @ self.membership
+        maximum = self.points @ self.membership
+        return (scored, possible, maximum)
+
+    def group_grades(self) -> np.ndarray:
+        """
+        students x groups current % grades, NaN for groups without graded work
+        cached until the next add_submissions, the result must not be modified
+        """
+        if 'group_grades' not in self.cache:
+            scored, possible, maximum = self.group_points()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.cache['group_grades'] = np.where(possible > 0, scored / possible * 100, np.nan)
+        return self.cache['group_grades']
+
+    def current_grades(self) -> np.ndarray:
+        """
+        Current % course grade per student, weights renormalized over the groups with graded work (like Canvas)
+        cached until the next add_submissions, the result must not be modified
+        """
+        if 'current_grades' not in self.cache:
+            grades = self.group_grades()
+            has_grade = ~np.isnan(grades)
+            weights = np.where(has_grade, self.weights, 0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.cache['current_grades'] = np.nansum(grades * weights, axis=1) / weights.sum(axis=1)
+        return self.cache['current_grades']
+
+    def required_average(self, ideal_score: float) -> np.ndarray:
+        """
+        % every student needs on all of their remaining assignments to finish at ideal_score
+        final grade = sum of weight% x group grade, as in calculate_grade and plan_term
+        NaN for students with nothing left to grade
+        """
+        scored, possible, maximum = self.group_points()
+        counted = maximum > 0
+        weights = np.where(counted, self.weights, 0)
+        maximum = np.where(counted, maximum, 1)
+        earned = (weights * scored / maximum).sum(axis=1)
+        remaining = (weights * (maximum - possible) / maximum).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            needed = (ideal_score - earned) / remaining * 100
+        return np.where(remaining > 0, needed, np.nan)
+
+    def student(self, user_id: int) -> dict:
+        i = self.student_index[user_id]
+        grades = self.group_grades()[i]
+        info = {}
+        info['name'] = self.names[i]
+        info['course_current_grade'] = float(self.current_grades()[i])
+        info['group_grades'] = {id: (None if np.isnan(g) else float(g)) for id, g in zip(self.group_ids, grades)}
+        return info
+
+class Instrumentation:
+    """
+    Timings and call counts collected by a B2A
+    hooks are called as hook(event, data) for every 'request', 'phase' and 'pathway' event
+    only aggregates and the last recent pathways are kept, so a long running service stays bounded
+    """
+    CALLS = ('recursive', 'solve', 'grade_possible', 'calculate_grade')
+
+    def __init__(self, recent=100) -> None:
+        self.lock = threading.Lock()
+        self.hooks = []
+        self.recent = recent
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.requests = {'count': 0, 'seconds': 0., 'max_seconds': 0., 'bytes': 0, 'status': Counter()}
+            self.phases = {} # {phase: {'count', 'seconds'}}
+            self.local = threading.local()
+            self.counters = {} # {thread: Counter of its algorithm function calls} of live threads, see calls
+            self.finished = Counter() # calls of threads that have exited, folded in by fold
+            self.pathway_stats = {} # {engine: {'count', 'seconds', 'max_seconds'}}
+            self.pathways = deque(maxlen=self.recent) # {'course_id', 'ideal_score', 'engine', 'seconds', 'calls'} of the last pathways
+
+    @property
+    def calls(self) -> Counter:
+        """
+        Algorithm function calls made on this thread, incremented without the lock; summary() adds up all threads
+        """
+        calls = getattr(self.local, 'calls', None)
+        if calls == None:
+            calls = Counter(dict.fromkeys(self.CALLS, 0)) # every key up front, summary() may read it while it's incremented
+            with self.lock:
+                self.fold()
+                self.counters[threading.current_thread()] = calls
+            self.local.calls = calls
+        return calls
+
+    def fold(self) -> None:
+        """
+        Moves the counters of exited threads (e.g. one per request of a ThreadingHTTPServer) into self.finished, under self.lock
+        """
+        for thread in [t for t in self.counters if not t.is_alive()]:
+            self.finished.update(dict(self.counters.pop(thread)))
+
+    def add_hook(self, hook) -> None:
+        self.hooks.append(hook)
+
+    def emit(self, event: str, data: dict) -> None:
+        for hook in self.hooks:
+            hook(event, data)
+
+    def record_request(self, path: str, seconds: float, size: int, status) -> None:
+        with self.lock:
+            self.requests['count'] += 1
+            self.requests['seconds'] += seconds
+            self.requests['max_seconds'] = max(self.requests['max_seconds'], seconds)
+            self.requests['bytes'] += size
+            self.requests['status'][status] += 1
+        if len(self.hooks) > 0:
+            self.emit('request', {'path': path, 'seconds': seconds, 'bytes': size, 'status': status})
+
+    def record_phase(self, phase: str, seconds: float) -> None:
+        with self.lock:
+            stats = self.phases.setdefault(phase, {'count': 0, 'seconds': 0.})
+            stats['count'] += 1
+            stats['seconds'] += seconds
+        if len(self.hooks) > 0:
+            self.emit('phase', {'phase': phase, 'seconds': seconds})
+
+    def stopwatch(self, prefix: str):
+        """
+        lap(name) records the time since the previous lap (or since the stopwatch started) as phase prefix.name
+        """
+        last = [time.perf_counter()]
+
+        def lap(name: str) -> None:
+            now = time.perf_counter()
+            self.record_phase(f"{prefix}.{name}", now - last[0])
+            last[0] = now
+        return lap
+
+    def record_pathway(self, data: dict) -> None:
+        with self.lock:
+            stats = self.pathway_stats.setdefault(data['engine'], {'count': 0, 'seconds': 0., 'max_seconds': 0.})
+            stats['count'] += 1
+            stats['seconds'] += data['seconds']
+            stats['max_seconds'] = max(stats['max_seconds'], data['seconds'])
+            self.pathways.append(data)
+        if len(self.hooks) > 0:
+            self.emit('pathway', data)
+
+    def summary(self) -> dict:
+        with self.lock:
+            summary = {}
+            summary['requests'] = dict(self.requests, status=dict(self.requests['status']))
+            summary['phases'] = {k: dict(v) for k, v in self.phases.items()}
+            self.fold()
+            calls = Counter(self.finished)
+            for counter in self.counters.values():
+                calls.update(dict(counter))
+            summary['calls'] = {k: v for k, v in calls.items() if v > 0}
+            summary['pathway_stats'] = {k: dict(v) for k, v in self.pathway_stats.items()}
+            summary['pathways'] = list(self.pathways)
+            return summary
+
+class Watcher:
+    """
+    Keeps the staged courses of a B2A current from cheap change signals instead of restaging them on a timer
+    every tick fetches the course list once (computed_current_score of every course in one request),
+    a course whose score moved is checked right away, the others when their own interval is due
+    a check fetches the submissions graded since the course was synced (usually an empty page) and patches
+    the course with them and the score from the course list, or restages it when its score moved without any submission changing
+    a course's score is only taken as seen once its check succeeds, a failed check is retried when its (doubled) interval is due
+    quiet checks double a course's interval up to max_interval, a change resets it; intervals get +-jitter
+    courses: callable returning the course ids to watch (all staged courses by default)
+    on_change(course_id, action) is called after a course is 'patched' or 'restaged'
+    """
+    def __init__(self, b2a, interval=60., max_interval=3600., jitter=0.1, workers=4, courses=None, on_change=None) -> None:
+        self.b2a = b2a
+        self.interval = interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.courses = courses
+        self.on_change = on_change
+        self.state = {} # {course_id: {score, failed, interval, due}}
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def delay(self, interval: float) -> float:
+        return interval * (1 + self.jitter * (2 * random.random() - 1))
+
+    def tick(self) -> dict:
+        """
+        One pass over the watched courses, {course_id: 'patched'/'restaged'/'quiet'/'failed'} for the ones checked
+        """
+        course_ids = list(self.courses()) if self.courses != None else list(self.b2a.dir)
+        index = self.b2a.course_index(refresh=True)
+        now = time.monotonic()
+        due = []
+        for course_id in course_ids:
+            score = index.get(course_id, {}).get('course_current_score')
+            state = self.state.get(course_id)
+            if state == None: # first sight, the staged course is the baseline
+                self.state[course_id] = {'score': score, 'failed': False, 'interval': self.interval, 'due': now + self.delay(self.interval)}
+                continue
+            moved = (score != state['score']) and not ((score != score) and (state['score'] != state['score'])) # NaN for courses without a score
+            if (moved and not state['failed']) or (now >= state['due']): # a failed course backs off even though its score still looks moved
+                due.append((course_id, score, moved))
+        for course_id in set(self.state) - set(course_ids):
+            self.state.pop(course_id)
+
+        actions = self.pool.map(lambda item: self.check(*item), due)
+        return dict(zip([course_id for course_id, _, _ in due], actions))
+
+    def check(self, course_id: int, score: float, moved: bool) -> str:
+        state = self.state[course_id]
+        try:
+            synced = self.b2a.synced.get(course_id)
+            action = 'quiet'
+            if synced == None: # loaded from a snapshot without a sync time
+                self.b2a.stage_course(course_id)
+                action = 'restaged'
+            else:
+                submissions = self.b2a.submissions_for_course(course_id, synced)
+                if (len(submissions) > 0) and (len(self.b2a.refresh_course(course_id, submissions, current_score=score)) > 0):
+                    action = 'patched'
+                elif moved:
+                    self.b2a.stage_course(course_id)
+                    action = 'restaged'
+        except Exception as e:
+            print(f"Checking course {course_id} failed: {e}")
+            action = 'failed'
+        state['failed'] = action == 'failed'
+        if not state['failed']:
+            state['score'] = score
+
+        state['interval'] = self.interval if action in ('patched', 'restaged') else min(self.max_interval, state['interval'] * 2)
+        state['due'] = time.monotonic() + self.delay(state['interval'])
+        if (self.on_change != None) and (action in ('patched', 'restaged')):
+            self.on_change(course_id, action)
+        return action
+
+    def start(self) -> None:
+        """
+        Runs tick every interval (+-jitter) on a background thread until stop()
+        """
+        def loop():
+            while not self.stop_event.wait(self.delay(self.interval)):
+                try:
+                    self.tick()
+                except Exception as e:
+                    print(f"Watching courses failed: {e}")
+        self.thread = threading.Thread(target=loop, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self.pool.shutdown(wait=False)
+
 class B2A:
 
 # == constructor ==
-    def __init__(self, domain_url: str, api_token: str) -> None: 
+    def __init__(self, domain_url: str, api_token: str, bulk=True, workers=8, pool_size=None, retries=4, backoff=0.5, throttle_below=200., cache=None, course_ttl=300., memo_size=4096, rate_limiter=None, timeout=(10., 60.)) -> None: 
         self.url = domain_url
         self.user = api_token
-
+        self.bulk = bulk # fetch all assignments and submissions for a course at once instead of per assignment
+        self.workers = workers # max concurrent HTTP requests (1 stages serially)
+
+        # shared keep-alive session, one pooled connection per worker by default
+        pool_size = pool_size or workers
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+        self.session.headers.update({'Authorization': "Bearer " + api_token})
+        self.retries = retries # retries on 429/5xx/Canvas throttling before giving up
+        self.backoff = backoff # base delay (s) of the exponential backoff
+        self.timeout = timeout # (connect, read) seconds per request, a stalled request is retried like a failed connection
+        self.throttle_below = throttle_below # slow down once X-Rate-Limit-Remaining drops below this
+        self.rate_limit_remaining = None # last X-Rate-Limit-Remaining seen
+        self.request_cost = 0. # last X-Request-Cost seen
+        self.cache = cache # optional ResponseCache shared by get_request/pagination
+        self.rate_limiter = rate_limiter # optional limiter shared with other clients, rate_limiter.wait() runs before every request
+
+        # staged courses are replaced whole by publish, never modified in place
         self.dir = {}
         self.assignments = {}
+        self.synced = {} # {course_id: UTC timestamp the course was last staged/refreshed from}
+        self.models = {} # {course_id: CourseModel} compiled from self.dir for the algorithm
+        self.rosters = {} # {course_id: Roster} staged in instructor mode
+
+        self.courses = None # {course_id: all_courses() entry}, memoized by course_index
+        self.courses_fetched = 0. # time.monotonic() of the last all_courses fetch
+        self.course_ttl = course_ttl # seconds the course index is reused before all_courses is fetched again
+        self.index_lock = threading.Lock()
+
+        self.memo_size = memo_size # max memoized stats per course (CourseModel.memo) before its memo is cleared
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+        self.request_count = 0 # total HTTP requests made
+        self.stage_requests = {} # {course_id: HTTP requests made by the last stage_course}
 
-# == Main Functions (stage_course, unstage_course, pathway) == 
+        self.lock = threading.Lock()
+        self.limit = threading.BoundedSemaphore(workers) # caps requests in flight across all threads
+        self.local = threading.local() # per-thread request counter of the course being staged and pinned CourseModel
+        self.background = None # ThreadPoolExecutor for prefetching, created on first use
+        self.metrics = Instrumentation() # request/phase timings and algorithm call counts, see summary()
+        self.renderers = {'text': self.render_text, 'json': self.render_json, 'csv': self.render_csv, 'html': self.render_html} # fmt: renderer(reports, stream), see write_dashboards
+
+# == Main Functions (stage_course, refresh_course, unstage_course, pathway) == 
+
+    def stage_courses(self, course_ids: list) -> None:
+        """
+        Stages several courses (e.g. a whole term) in parallel
+        """
+        self.parallel(self.stage_course, course_ids)
 
     def stage_course(self, course_id: int) -> None:
-        df = pd.DataFrame(self.all_courses())
-        course = df[df['course_id'] == course_id].iloc[0]
-        if len(course) == 0:
-            raise Exception("Course not found. Use the all_courses() function to see a list of available courses.")
+        counter = [0]
+        self.local.counter = counter
+        synced = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        try:
+            self._stage_course(course_id)
+        finally:
+            self.local.counter = None
+        self.stage_requests[course_id] = counter[0]
+        self.synced[course_id] = synced
+        print(f"Successfully staged course {self.dir[course_id]['course_name']} for grade tracking ({counter[0]} requests).")
+
+    def _stage_course(self, course_id: int) -> None:
+        lap = self.metrics.stopwatch('stage_course')
+        course = self.course_index().get(course_id)
+        if course == None: # e.g. enrolled after the index was fetched
+            course = self.course_index(refresh=True).get(course_id)
+        lap('course_index')
+        if course == None:
+            raise CanvasError("Course not found. Use the all_courses() function to see a list of available courses.", 404)
         elif course['access_removed'] == True:
-            raise Exception("Access removed for course.")
+            raise CanvasError("Access removed for course.", 403)
         else:
-            groups = self.all_grade_groups_for_course(course_id)
+            if self.bulk:
+                groups, course_assignments = self.assignments_for_course(course_id)
+            else:
+                groups = self.all_grade_groups_for_course(course_id)
+                course_assignments = {}
+            lap('fetch')
+            group_stats = self.parallel(lambda group: self.course_group_stats(course_id, group['group_id'], course_assignments.get(group['group_id'])), groups)
+            lap('group_stats')
             group_ids = {}
             all_assignments = {}
             lowest_grades = {}
-            for group in groups:
+            for group, stats in zip(groups, group_stats):
                 group_info = {}
-                scored_pts, possible_pts, maximum_pts, assignments = self.course_group_stats(course_id, group['group_id'])
+                scored_pts, possible_pts, maximum_pts, assignments = stats
                 group_info['group_name'] = group['group_name']
                 group_info['group_weight'] = group['group_weight']
                 group_info['group_current_grade'] = self.calculate_percentage(scored_pts, possible_pts)
@@ -46,47 +622,140 @@ class B2A:
                     assignment_info['grade'] = self.calculate_percentage(a['score'], a['points_possible'])
                     assignment_info['percent_of_total_grade'] = 0
                     assignment_info['due_at'] = a['due_at']
-                    if a['points_possible'] != None:
+                    if (a['points_possible'] != None) and (maximum_pts > 0):
                         assignment_info['percent_of_total_grade'] = (a['points_possible'] / maximum_pts) * group['group_weight']
                     all_assignments[a['assignment_id']] = assignment_info
 
                     assignment_info['assignment_id'] = a['assignment_id']
                     group_assignments.append(assignment_info)
 
-                graded_a = [d['assignment_id'] for d in group_assignments if (d['score'] != None) & (d['percent_of_total_grade'] > 0)]
-                future_a = [d['assignment_id'] for d in group_assignments if (d['score'] == None) & (d['percent_of_total_grade'] > 0)]
-                ungraded_a = [d['assignment_id'] for d in group_assignments if (d['points_possible'] == 0) | (d['percent_of_total_grade'] == 0) | (d['percent_of_total_grade'] == None)]
-
-                a_dict = {}
-                a_dict['graded'] = graded_a
-                a_dict['future'] = future_a
-                a_dict['ungraded'] = ungraded_a
-                group_info['assignments'] = a_dict
+                group_info['assignments'] = self.group_assignment_lists(group_assignments)
 
                 group_ids[group['group_id']] = group_info
 
-            self.assignments[course_id] = all_assignments
-
             course_info = {}
             course_info['course_current_grade'] = course['course_current_score']
             course_info['course_name'] = course['course_name']
             course_info['grade_groups'] = group_ids
 
-            self.dir[course_id] = course_info
+            self.publish(course_id, course_info, all_assignments)
+            lap('build')
+
+    def refresh_course(self, course_id: int, submissions=None, current_score=None) -> list:
+        """
+        Patches a staged course with the submissions graded since it was last synced
+        (or with submissions already fetched that way, see Watcher)
+        only the groups of changed assignments are recomputed
+        returns the ids of the changed assignments
+        current_score: course_current_grade published with the patch (Canvas' computed_current_score, as the Watcher sees it)
+        new assignments, and course_current_grade without current_score, are only picked up by stage_course
+        """
+        if course_id not in self.dir:
+            raise Exception("Cannot refresh course that was never staged.")
+        synced = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        if submissions == None:
+            submissions = self.submissions_for_course(course_id, self.synced[course_id])
+
+        course_info = self.dir[course_id]
+        assignments = self.assignments[course_id]
+        gg = course_info['grade_groups']
+        group_of = {} # {assignment_id: group_id}
+        for id, info in gg.items():
+            for a_ids in info['assignments'].values():
+                for a_id in a_ids:
+                    group_of[a_id] = id
+
+        changed = []
+        changed_groups = set()
+        updated = {} # {assignment_id: patched copy}, the staged dicts may be read by a running pathway
+        for a_id, submission in submissions.items():
+            assignment = assignments.get(a_id)
+            if (assignment == None) or (a_id not in group_of):
+                continue
+            if assignment['score'] == submission['score']:
+                continue
+            updated[a_id] = dict(assignment, score=submission['score'], grade=self.calculate_percentage(submission['score'], assignment['points_possible']))
+            changed.append(a_id)
+            changed_groups.add(group_of[a_id])
+
+        if len(changed_groups) > 0:
+            assignments = dict(assignments)
+            assignments.update(updated)
+            gg = dict(gg)
+            for id in changed_groups:
+                gg[id] = self.recompute_group(course_id, id, [a for a_id, a in assignments.items() if group_of.get(a_id) == id])
+            course_info = dict(course_info, grade_groups=gg)
+            if current_score != None:
+                course_info['course_current_grade'] = current_score
+            self.publish(course_id, course_info, assignments)
+
+        self.synced[course_id] = synced
+        print(f"Refreshed course {self.dir[course_id]['course_name']}: {len(changed)} assignments changed.")
+        return changed
+
+    def recompute_group(self, course_id: int, group_id: int, group_assignments: list) -> dict:
+        """
+        Copy of one staged group with its points, current grade and assignment lists recomputed from group_assignments
+        """
+        group_info = dict(self.dir[course_id]['grade_groups'][group_id])
+        scored_pts, possible_pts, maximum_pts, _ = self.course_group_stats(course_id, group_id, group_assignments)
+        group_info['group_current_grade'] = self.calculate_percentage(scored_pts, possible_pts)
+        group_info['scored_points'] = float(scored_pts)
+        group_info['possible_points'] = float(possible_pts)
+        group_info['assignments'] = self.group_assignment_lists(group_assignments)
+        return group_info
+
+    def watch(self, **kwargs):
+        """
+        Starts a Watcher (see its arguments) that keeps the staged courses current, returns it
+        """
+        watcher = Watcher(self, **kwargs)
+        watcher.start()
+        return watcher
 
-            print(f"Successfully staged course {self.dir[course_id]['course_name']} for grade tracking.")
+    def publish(self, course_id: int, course_info: dict, assignments: dict) -> None:
+        """
+        Swaps in a newly built staged course with a new CourseModel (and so an empty memo)
+        the old entries are replaced, not modified, so a pathway pinned to the old model is unaffected
+        """
+        model = CourseModel(course_info['grade_groups'], assignments, course_info)
+        with self.lock:
+            self.assignments[course_id] = assignments
+            self.dir[course_id] = course_info
+            self.models[course_id] = model
 
     def unstage_course(self, course_id: int) -> None:
         if course_id in self.dir:
             course_name = self.dir[course_id]['course_name']
-            self.dir.pop(course_id)
-            self.assignments.pop(course_id)
+            with self.lock:
+                self.dir.pop(course_id)
+                self.assignments.pop(course_id)
+                self.synced.pop(course_id, None)
+                self.models.pop(course_id, None)
             print(f"Unstaged course {course_name} from grade tracking.")
         else:
             raise Exception("Cannot unstage course that was never staged.")
 
-    def pathway(self, course_id: int, ideal_score: float, test_groups={}):
+    def pathway(self, course_id: int, ideal_score: float, test_groups={}, engine='iterative', verbose=False, trace=None, dashboard=True):
+        """
+        engine: 'iterative' steps group grades with recursive, 'solver' solves for them in one pass with solve
+        verbose: print every iteration of recursive, trace: PathwayTrace filled with every iteration of recursive
+        dashboard: print pathway_db for the result
+        runs on the course's current CourseModel (see snapshot) and its own copies of the group grades,
+        so pathways of any courses can run on several threads at once, also while courses are restaged
+        """
+        if engine not in ('iterative', 'solver'):
+            raise Exception(f"Unknown pathway engine {engine}")
 
+        with self.snapshot(course_id):
+            path = self._pathway(course_id, ideal_score, test_groups, engine, verbose, trace)
+            if dashboard:
+                self.pathway_db(course_id, path, ideal_score)
+        return path
+
+    def _pathway(self, course_id: int, ideal_score: float, test_groups: dict, engine: str, verbose: bool, trace) -> dict:
+        start = time.perf_counter()
+        calls = self.metrics.calls.copy()
         initial, set_groups, outliers = self.set_initial_group_grades(course_id, ideal_score)
 
         for id, grade in test_groups.items():
@@ -101,6 +770,8 @@ class B2A:
         high_groups = []
 
         for k,v in outliers.items():
+            if k not in initial: # grade given in test_groups
+                continue
             if v == (True, True):
                 low_groups.append(k)
                 high_groups.append(k)
@@ -111,195 +782,657 @@ class B2A:
 
         less = self.calculate_grade(course_id, initial, set_groups, test_groups) < ideal_score
 
-        path = self.recursive(course_id, initial, set_groups, test_groups, low_groups, high_groups, ideal_score, less)
+        if engine == 'solver':
+            path = self.solve(course_id, initial, set_groups, test_groups, low_groups, high_groups, ideal_score, less)
+        else:
+            path = self.recursive(course_id, initial, set_groups, test_groups, low_groups, high_groups, ideal_score, less, verbose=verbose, trace=trace)
 
-        self.pathway_db(course_id, path, ideal_score)
+        self.metrics.record_pathway({'course_id': course_id, 'ideal_score': ideal_score, 'engine': engine, 'seconds': time.perf_counter() - start, 'calls': dict(self.metrics.calls - calls)})
         return path
 
-# == Dashboard == 
-
-    def pathway_db(self, course_id: int, path: dict, ideal_score: float):
-        # Current grade report
-        print()
-        print(f"== Dashboard for course \"{self.dir[course_id]['course_name']}\" ==")
-        print()
-        overall_grade = self.dir[course_id]['course_current_grade']
-
-        total_num_groups = len(self.dir[course_id]['grade_groups'])
-        num_groups = len(path)
-        print(f"  > {num_groups} Grade groups considered ({total_num_groups} total)")
-
-        for id, grades in self.dir[course_id]['grade_groups'].items():
-            info = self.dir[course_id]['grade_groups'][id]
-            current_grade, remaining_assignments, avg_score_needed = self.group_progress(course_id, id, path[id])
-            print(f"    > {info['group_name']}: Current grade {info['group_current_grade']}% with weight of {info['group_weight']}%")
-            print(f"      > Pathway grade calculated: {path[id]}")
-            if avg_score_needed == None:
-                print(f"      > No remaining assignments")
+    def pathway_parallel(self, queries: list, engine='iterative', workers=None, processes=False) -> list:
+        """
+        pathway for many (course_id, ideal_score) or (course_id, ideal_score, test_groups) queries at once, without the dashboards
+        returns the paths in query order
+        threads (default) share the staged courses; pathway is pure Python, so use processes=True to spread
+        large batches over cores, each worker process gets a copy of the staged courses the queries need
+        """
+        queries = [(q[0], q[1], q[2] if len(q) > 2 else {}) for q in queries]
+        workers = workers or self.workers
+        if (workers <= 1) | (len(queries) <= 1):
+            return [self.pathway(course_id, ideal_score, test_groups, engine=engine, dashboard=False) for course_id, ideal_score, test_groups in queries]
+        if not processes:
+            with ThreadPoolExecutor(max_workers=min(workers, len(queries))) as executor:
+                return list(executor.map(lambda q: self.pathway(q[0], q[1], q[2], engine=engine, dashboard=False), queries))
+
+        staged = {}
+        for course_id, _, _ in queries:
+            if course_id not in staged:
+                model = self.model(course_id)
+                staged[course_id] = (model.course, model.assignments)
+        with ProcessPoolExecutor(max_workers=min(workers, len(queries)), initializer=_pathway_worker_init, initargs=(staged,)) as executor:
+            return list(executor.map(_pathway_worker, [q + (engine,) for q in queries], chunksize=max(1, len(queries) // (workers * 4))))
+
+    def pathway_many(self, course_id: int, targets: list, test_groups={}, m=1, n=0.25) -> dict:
+        """
+        {target: {group_id: % grade needed}} for every target score, solved together
+        Same answers as pathway(..., engine='solver') for each target, without the dashboard;
+        outliers, bounds and weights are computed once and all targets are solved as one batch with solve_batch
+        """
+        with self.snapshot(course_id):
+            return self._pathway_many(course_id, targets, test_groups, m, n)
+
+    def _pathway_many(self, course_id: int, targets: list, test_groups: dict, m: float, n: float) -> dict:
+        if len(targets) == 0:
+            return {}
+        outliers = self.outliers_for_course(course_id)
+        groups = self.model(course_id).groups
+
+        starts = []
+        fixed_grades = []
+        less = []
+        for target in targets:
+            initial, set_groups, has_low_high = self.set_initial_group_grades(course_id, target, outliers)
+            for id in test_groups:
+                if id in initial:
+                    initial.pop(id)
+                elif id in set_groups:
+                    set_groups.pop(id)
+                else:
+                    raise Exception("Id does not exist")
+            ids = list(initial)
+            starts.append([initial[id] for id in ids])
+            fixed_grades.append(sum(groups[id].weight / 100 * grade for id, grade in {**set_groups, **test_groups}.items()))
+            less.append(self.calculate_grade(course_id, initial, set_groups, test_groups) < target)
+
+        low_groups = [id for id in ids if has_low_high[id][0]]
+        high_groups = [id for id in ids if has_low_high[id][1]]
+        fixed = set_groups.copy()
+        fixed.update(test_groups)
+        if len(ids) == 0:
+            return {target: fixed.copy() for target in targets}
+
+        remaining = np.array(targets, dtype=float) - np.array(fixed_grades)
+        grades, reached = self.solve_batch(course_id, ids, np.array(starts, dtype=float), remaining, np.array(less), low_groups, high_groups, m, n)
+
+        paths = {}
+        for i, target in enumerate(targets):
+            if reached[i]:
+                path = {id: float(format(grade, ".4f")) for id, grade in zip(ids, grades[i])}
+                path.update(fixed)
             else:
-                print(f"      > Avg score of {avg_score_needed} needed on {len(remaining_assignments)} remaining assignments:")
-            for a in remaining_assignments:
-                print(f"        > {a['assignment_name']}, {a['points_possible']} pts possible. (goal: {format(a['points_possible']*avg_score_needed/100, '.3f')} pts)")
-        print()
-        print("== End of Dashboard ==")
+                saturated = dict(zip(ids, grades[i].tolist()))
+                path = self.borderline(course_id, saturated, set_groups, test_groups, target, self.calculate_grade(course_id, saturated, set_groups, test_groups))
+                path = {id: grade if id in test_groups else float(format(grade, ".4f")) for id, grade in path.items()}
+            paths[target] = path
+        return paths
+
+    def stage_roster(self, course_id: int, section_id=None) -> Roster:
+        """
+        Instructor/TA mode: stages every student of a course (or one section) into a single Roster
+        submissions are streamed into the score matrix one page at a time
+        """
+        groups, assignments = self.assignments_for_course(course_id, submissions=False)
+        scope = f"sections/{section_id}" if section_id != None else f"courses/{course_id}"
+
+        students = []
+        for e in self.items(f"https://{self.url}/api/v1/{scope}/enrollments?type[]=StudentEnrollment&per_page=100"):
+            students.append({'user_id': e['user_id'], 'name': e.get('user', {}).get('name')})
+        students = list({s['user_id']: s for s in students}.values()) # one row per student, even with several enrollments
 
-# == Algorithm (recursive, borderline, calc_borderline) == 
+        roster = Roster(course_id, groups, [a for group in assignments.values() for a in group], students)
+        for page in self.pages(f"https://{self.url}/api/v1/{scope}/students/submissions?student_ids[]=all&per_page=100"):
+            roster.add_submissions(page)
 
-    def recursive(self, course_id: int, groups: dict, set_groups: dict, test_groups: dict, low_outliers: list, high_outliers: list, ideal_score: float, less_than: bool, count=0, m=1, n=0.25) -> dict:
+        self.rosters[course_id] = roster
+        print(f"Successfully staged roster of {len(roster.student_ids)} students for course {course_id}.")
+        return roster
+
+# == Snapshots (save_snapshot, load_snapshot) ==
+
+    SNAPSHOT_VERSION = 1
+
+    def save_snapshot(self, path: str, course_ids=None) -> None:
         """
-        Groups: group grades being modified
-        set_groups: group grades that are done being modified (can contain groups with finalized grades)
-        test_groups: group grades from user input (should contain groups with finalized grades), will not be touched
+        Writes staged courses (all by default) to a compressed .npz snapshot
+        course and group info go in a JSON header, assignments in one column array per field
+        """
+        course_ids = list(self.dir) if course_ids == None else course_ids
+        courses = []
+        rows = [] # (course_id, group_id, assignment_id, assignment)
+        for course_id in course_ids:
+            course = self.dir[course_id]
+            order = {a_id: i for i, a_id in enumerate(self.assignments[course_id])} # staging order of the course's assignments
+            groups = []
+            for group_id, info in course['grade_groups'].items():
+                group = {k: v for k, v in info.items() if k != 'assignments'}
+                group['group_id'] = group_id
+                groups.append(group)
+                a_ids = {} # insertion-ordered set, an assignment can be in several lists
+                for kind in ('graded', 'future', 'ungraded'):
+                    a_ids.update(dict.fromkeys(info['assignments'][kind]))
+                for a_id in sorted(a_ids, key=order.get):
+                    rows.append((course_id, group_id, a_id, self.assignments[course_id][a_id]))
+            courses.append({'course_id': course_id, 'course_name': course['course_name'], 'course_current_grade': course['course_current_grade'], 'synced': self.synced.get(course_id), 'grade_groups': groups})
+
+        header = {'version': self.SNAPSHOT_VERSION, 'courses': courses}
+        number = lambda x: np.nan if x == None else x
+        np.savez_compressed(path,
+            header=np.frombuffer(json.dumps(header).encode(), dtype=np.uint8),
+            course_id=np.array([r[0] for r in rows], dtype=np.int64),
+            group_id=np.array([r[1] for r in rows], dtype=np.int64),
+            assignment_id=np.array([r[2] for r in rows], dtype=np.int64),
+            points_possible=np.array([number(r[3]['points_possible']) for r in rows], dtype=np.float64),
+            score=np.array([number(r[3]['score']) for r in rows], dtype=np.float64),
+            grade=np.array([number(r[3]['grade']) for r in rows], dtype=np.float64),
+            percent_of_total_grade=np.array([number(r[3]['percent_of_total_grade']) for r in rows], dtype=np.float64),
+            name=np.array([r[3]['name'] or '' for r in rows], dtype=str),
+            due_at=np.array([r[3]['due_at'] or '' for r in rows], dtype=str))
+
+    def load_snapshot(self, path: str) -> list:
         """
+        Stages the courses of a snapshot written by save_snapshot without any API call
+        returns the course ids loaded
+        """
+        with np.load(path) as data:
+            header = json.loads(data['header'].tobytes())
+            if header.get('version') != self.SNAPSHOT_VERSION:
+                raise Exception(f"Unsupported snapshot version {header.get('version')}.")
+            columns = {k: data[k] for k in data.files if k != 'header'}
+
+        value = lambda x: None if np.isnan(x) else float(x)
+        by_group = {}
+        for i in range(len(columns['assignment_id'])):
+            assignment_info = {}
+            assignment_info['name'] = str(columns['name'][i])
+            assignment_info['points_possible'] = value(columns['points_possible'][i])
+            assignment_info['score'] = value(columns['score'][i])
+            assignment_info['grade'] = value(columns['grade'][i])
+            assignment_info['percent_of_total_grade'] = value(columns['percent_of_total_grade'][i])
+            assignment_info['due_at'] = str(columns['due_at'][i]) or None
+            assignment_info['assignment_id'] = int(columns['assignment_id'][i])
+            by_group.setdefault((int(columns['course_id'][i]), int(columns['group_id'][i])), []).append(assignment_info)
+
+        loaded = []
+        for course in header['courses']:
+            course_id = course['course_id']
+            all_assignments = {}
+            group_ids = {}
+            for group in course['grade_groups']:
+                group_assignments = by_group.get((course_id, group['group_id']), [])
+                for a in group_assignments:
+                    all_assignments[a['assignment_id']] = a
+                group_info = {k: v for k, v in group.items() if k != 'group_id'}
+                group_info['assignments'] = self.group_assignment_lists(group_assignments)
+                group_ids[group['group_id']] = group_info
 
-        print(f"== Starting the {count}th iteration of the recursive function == ")
-        print(f"  > initial {groups}, set {set_groups}, test {test_groups}")
-
-        calculated_grade = self.calculate_grade(course_id, groups, set_groups, test_groups)
-
-        print(f'  > Calculated grade {calculated_grade}')
-        if len(groups) == 0:
-            print(f"    > No more group grades able to be modified (all groups are finalized).")
-            return set_groups
-
-        if (calculated_grade < ideal_score) & less_than: # coming from low end
-            print("    > Calculated grade is less than ideal score and coming from bottom")
-            if (len(high_outliers) > 1) & ((count % 2 == 0) | (len(low_outliers) == 0)): # Increase avgs for groups with high outliers by 'm'
-                print(f'    > Increase avgs for groups with high outliers by {m}')
-                for id in high_outliers.copy():
-                    if self.grade_possible(course_id, id, groups.get(id), m) == True: 
-                        print(f'      > New grade is possible for {id} (prev grade {groups[id]})')
-                        groups[id] = groups.get(id) + m # new grade is possible
-                        print(f'      > New grade for {id}: {groups[id]}')
-                    else:
-                        print(f'      > New grade is not possible for {id} (prev grade {groups[id]})')
-                        print(f'      > Set grade for {id}')
-                        set_groups.update({id:groups.get(id)}) # group grade is set, should not be changed
-                        groups.pop(id)
-                        high_outliers.remove(id)
-                        
-                return self.recursive(course_id, groups, set_groups, test_groups, low_outliers, high_outliers, ideal_score, less_than, count+1, m, n)
-
-            elif (len(low_outliers) > 0) & ((count % 2 == 1) | (len(high_outliers) == 0)): # Increase avgs for groups with low outliers by 'n'
-                print(f'    > Increase avgs for groups with low outliers by {n}')
-                for id in low_outliers.copy():
-                    if self.grade_possible(course_id, id, groups.get(id), n) == True: 
-                        print(f'      > New grade is possible for {id} (prev grade {groups[id]})')
-                        groups[id] = groups.get(id) + n # new grade is possible
-                        print(f'      > New grade for {id}: {groups[id]}')
-                    else:
-                        print(f'     > New grade is not possible for {id} (prev grade {groups[id]})')
-                        print(f'     > Set grade for {id}')
-                        set_groups.update({id:groups.get(id)}) # group grade is set, should not be changed
-                        groups.pop(id)
-                        low_outliers.remove(id)
-
-                return self.recursive(course_id, groups, set_groups, test_groups, low_outliers, high_outliers, ideal_score, less_than, count+1, m, n)
-
-            else: # increment by n for each group in groups (those where current grades == performance)
-                print(f"    > Incrementing by {n} for each group with remaining assignments")
-                cannot_adj = True # keeps track to see if all groups are non-adjustable
-                for id in groups:
-                    print(f'      > Prev grade for group {id}: {groups[id]}')
-                    if self.grade_possible(course_id, id, groups.get(id), n) == True:
-                        groups[id] = groups.get(id) + n
-                        print(f'      > New grade for group {id}: {groups[id]}')
-                        cannot_adj = False
-                    else:
-                        print(f'      > Adjustment not possible')
-                for id in set_groups:
-                    if len(self.dir[course_id]['grade_groups'][id]['assignments']['future']) > 0:
-                        print(f'      > Prev grade for set_groups {id}: {set_groups[id]}')
-                        if self.grade_possible(course_id, id, groups.get(id), n) == True:
-                            set_groups[id] = set_groups.get(id) + n
-                            print(f'      > New grade for set_groups {id}: {set_groups[id]}')
-                            cannot_adj = False
-                        else:
-                            print(f'      > Adjustment not possible for {id}')
-
-                if cannot_adj: # no more adjustment can be made
-                    return self.borderline(course_id, groups, set_groups, test_groups, ideal_score, calculated_grade)
-
-                return self.recursive(course_id, groups, set_groups, test_groups, low_outliers, high_outliers, ideal_score, less_than, count+1, m, n)
-
-        elif (calculated_grade > ideal_score) & less_than: # ideal score reached from low end (calculated is greater than ideal score)
-            print('    > Calculated grade greater than ideal score from low end')
-            return self.borderline(course_id, groups, set_groups, test_groups, ideal_score, calculated_grade)
-
-        elif (calculated_grade > ideal_score) & (not less_than): # coming from high end
-            print("    > Calculated grade is greater than ideal score and coming from top")
-            if (len(low_outliers) > 0) & ((count % 2 == 0) | (len(high_outliers) == 0)): # Decrease avgs for groups with low outliers by 'm'
-                print(f'    > Decrease avgs for groups with high outliers by {m}')
-                for id in low_outliers.copy():
-                    if self.grade_possible(course_id, id, groups.get(id), -m) == True: 
-                        print(f'      > New grade is possible for {id} (prev grade {groups[id]})')
-                        groups[id] = groups.get(id) - m # new grade is possible
-                        print(f'      > New grade for {id}: {groups[id]}')
-                    else:
-                        print(f'     > New grade is not possible for {id} (prev grade {groups[id]})')
-                        print(f'     > Set grade for {id}')
-                        set_groups.update({id:groups.get(id)}) # group grade is set, should not be changed
-                        groups.pop(id)
-                        low_outliers.remove(id)
-
-                return self.recursive(course_id, groups, set_groups, test_groups, low_outliers, high_outliers, ideal_score, not less_than, count+1, m, n)
-
-            elif (len(high_outliers) > 0) & ((count % 2 == 1) | (len(low_outliers) == 0)): # Decrease avgs for groups with high outliers by 'n'
-                print(f'    > Decrease avgs for groups with high outliers by {n}')
-                for id in high_outliers.copy():
-                    if self.grade_possible(course_id, id, groups.get(id), -n) == True: 
-                        print(f'      > New grade is possible for {id} (prev grade {groups[id]})')
-                        groups[id] = groups.get(id) - n # new grade is possible
-                        print(f'      > New grade for {id}: {groups[id]}')
-                    else:
-                        print(f'     > New grade is not possible for {id} (prev grade {groups[id]})')
-                        print(f'     > Set grade for {id}')
-                        set_groups.update({id:groups.get(id)}) # group grade is set, should not be changed
-                        groups.pop(id)
-                        high_outliers.remove(id)
-
-                return self.recursive(course_id, groups, set_groups, test_groups, low_outliers, high_outliers, ideal_score, not less_than, count+1, m, n)
-
-            else: # decrement by n for each group in groups (those where current grades == performance)
-                print(f'    > Decrementing by {n} for each group with remaining assignments')
-                cannot_adj = True
-                for id in groups:
-                    print(f'      > Prev grade for group {id}: {groups[id]}')
-                    if self.grade_possible(course_id, id, groups[id], -n) == True:
-                        groups[id] = groups.get(id) - n
-                        print(f'      > New grade for group {id}: {groups[id]}')
-                        cannot_adj = False
-                    else:
-                        print(f'      > Adjustment not possible for {id}')
-                for id in set_groups:
-                    if len(self.dir[course_id]['grade_groups'][id]['assignments']['future']) > 0:
-                        print(f'      > Prev grade for set_groups {id}: {set_groups[id]}')
-                        if self.grade_possible(course_id, id, set_groups[id], -n) == True:
-                            set_groups[id] = set_groups.get(id) - n
-                            print(f'      > New grade for set_groups {id}: {set_groups[id]}')
-                            cannot_adj = False
-                        else:
-                            print(f'      > Adjustment not possible for {id}')
-
-                if cannot_adj: # no more adjustment can be made
-                    return self.borderline(course_id, groups, set_groups, test_groups, ideal_score, calculated_grade)
-                    
-                return self.recursive(course_id, groups, set_groups, test_groups, low_outliers, high_outliers, ideal_score, less_than, count+1, m, n)
-        
-        elif (calculated_grade < ideal_score) & (not less_than): # ideal score reached from lhigh end (calculated is lower than ideal score)
-            print('    > Calculated grade lower than ideal score from high end')
-            return self.borderline(course_id, groups, set_groups, test_groups, ideal_score, calculated_grade)
+            course_info = {}
+            course_info['course_current_grade'] = course['course_current_grade']
+            course_info['course_name'] = course['course_name']
+            course_info['grade_groups'] = group_ids
+            self.publish(course_id, course_info, all_assignments)
+            if course['synced'] != None:
+                self.synced[course_id] = course['synced']
+            loaded.append(course_id)
+        return loaded
+
+# == Simulation (simulate, simulation_model) ==
 
-        elif calculated_grade == ideal_score:
-            print("      > Calculated grade equals ideal score")
-            copy = groups.copy()
-            copy.update(set_groups)
-            copy.update(test_groups)
+    # letter grade: lowest % course grade that earns it
+    LETTERS = {'A': 93., 'A-': 90., 'B+': 87., 'B': 83., 'B-': 80., 'C+': 77., 'C': 73., 'C-': 70., 'D+': 67., 'D': 63., 'D-': 60., 'F': 0.}
 
-            return copy
+    def simulate(self, course_id: int, trials=20000, seed=None, processes=1, letters=None) -> dict:
+        """
+        Monte Carlo distribution of the final course grade: every remaining assignment is scored from its group's
+        fitted distribution (see simulation_model) in NumPy batches, processes > 1 splits the trials over a process pool
+        {trials, mean, std, percentiles {5, 25, 50, 75, 95}, at_least {letter: P(final >= cutoff)}, letters {letter: P(final earns it)}, grades}
+        """
+        letters = letters if letters != None else self.LETTERS
+        params = self.simulation_model(course_id)
+        seeds = np.random.SeedSequence(seed).spawn(max(1, processes))
+        if processes <= 1:
+            grades = _simulate_trials(params, trials, seeds[0])
+        else:
+            shares = [trials // processes + (i < trials % processes) for i in range(processes)]
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                grades = np.concatenate(list(executor.map(_simulate_trials, [params] * processes, shares, seeds)))
+
+        cutoffs = sorted(letters.items(), key=lambda l: -l[1])
+        at_least = {letter: float(np.mean(grades >= cutoff)) for letter, cutoff in cutoffs}
+        earned = {}
+        above = 0.
+        for letter, _ in cutoffs:
+            earned[letter] = at_least[letter] - above
+            above = at_least[letter]
+
+        result = {}
+        result['trials'] = len(grades)
+        result['mean'] = float(grades.mean())
+        result['std'] = float(grades.std())
+        result['percentiles'] = {q: float(v) for q, v in zip((5, 25, 50, 75, 95), np.percentile(grades, (5, 25, 50, 75, 95)))}
+        result['at_least'] = at_least
+        result['letters'] = earned
+        result['grades'] = grades
+        return result
+
+    def simulation_model(self, course_id: int) -> dict:
+        """
+        Inputs of _simulate_trials for a staged course
+        {fixed: weighted % grade of groups that are done, groups: [(weight, scored, maximum, mean %, std %, points of remaining assignments)]}
+        mean/std are fitted to the group's graded assignment scores (to all graded scores of the course when the group has none)
+        memoized until the course is restaged
+        """
+        return self.memo(course_id, 'simulation', lambda: self._simulation_model(course_id))
+
+    def _simulation_model(self, course_id: int) -> dict:
+        model = self.model(course_id)
+        scores = {} # {group_id: [% scores of graded assignments]}
+        for id, group in model.groups.items():
+            scores[id] = []
+            for a_id in group.graded:
+                a = model.assignments[a_id]
+                if a['points_possible']:
+                    scores[id].append(100 * a['score'] / a['points_possible'])
+        pooled = [score for group_scores in scores.values() for score in group_scores]
+
+        fixed = 0.
+        groups = []
+        for id, group in model.groups.items():
+            if (group.weight == 0) | (group.maximum == 0):
+                continue
+            if len(group.future) == 0:
+                fixed += group.weight / 100 * (group.current_grade or 0.)
+                continue
+            fit = scores[id] if len(scores[id]) > 0 else pooled
+            if len(fit) == 0:
+                raise Exception(f"No graded assignments in course {course_id} to simulate from.")
+            mean = float(np.mean(fit))
+            std = float(np.std(fit, ddof=1)) if len(fit) > 1 else float(np.std(pooled, ddof=1)) if len(pooled) > 1 else 0.
+            points = np.array([model.assignments[a_id]['points_possible'] for a_id in group.future], dtype=np.float32)
+            groups.append((group.weight, group.scored, group.maximum, mean, std, points))
+        return {'fixed': fixed, 'groups': groups}
+
+# == Term planner (plan_term) ==
+
+    def plan_term(self, targets) -> list:
+        """
+        Required averages for all staged courses at once, from the staged groups only (no API calls)
+        targets: {course_id: % course grade wanted}, or one % for every staged course
+        per course: the % needed on every remaining assignment (required_average), the % the student is averaging
+        on graded work in those groups (pace), and effort = required_average - pace, the extra % needed per remaining point
+        returns one dict per course, most effort first (courses with nothing left to grade last)
+        """
+        if not isinstance(targets, dict):
+            targets = {course_id: targets for course_id in self.dir}
+        course_ids = list(targets)
+        models = [self.model(course_id) for course_id in course_ids]
+        if len(models) == 0:
+            return []
+
+        # every group of every course in one set of arrays, course says which course a group belongs to
+        course = np.repeat(np.arange(len(models)), [len(m.ids) for m in models])
+        weights = np.concatenate([m.weights for m in models]) / 100
+        maximum = np.concatenate([m.maximum for m in models])
+        scored = np.concatenate([m.scored for m in models])
+        possible = np.concatenate([m.possible for m in models])
+        remaining = maximum - possible
+        open_groups = (np.concatenate([m.future for m in models]) > 0) & (maximum > 0)
+
+        # final grade = fixed + slope * average % on the remaining assignments
+        with np.errstate(divide='ignore', invalid='ignore'):
+            done = np.where(~open_groups & (possible > 0), weights * scored / possible * 100, 0.) # finished groups count at their current grade
+            fixed = np.where(open_groups, weights * scored / maximum * 100, done)
+            slope = np.where(open_groups, weights * remaining / maximum, 0.)
+            pace = np.where(open_groups & (possible > 0), scored / possible * 100, 0.)
+        paced = np.where(open_groups & (possible > 0), slope, 0.)
+        n = len(models)
+        fixed = np.bincount(course, fixed, n)
+        slope = np.bincount(course, slope, n)
+        remaining_points = np.bincount(course, np.where(open_groups, remaining, 0.), n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            required = (np.array([targets[c] for c in course_ids], dtype=float) - fixed) / slope
+            pace = np.bincount(course, paced * pace, n) / np.bincount(course, paced, n)
+
+        value = lambda x: None if not np.isfinite(x) else round(float(x), 3)
+        plan = []
+        for i, course_id in enumerate(course_ids):
+            entry = {}
+            entry['course_id'] = course_id
+            entry['course_name'] = self.dir[course_id]['course_name']
+            entry['target'] = targets[course_id]
+            entry['current_grade'] = self.dir[course_id]['course_current_grade']
+            entry['remaining_points'] = float(remaining_points[i])
+            if slope[i] > 0:
+                entry['required_average'] = value(required[i])
+                entry['points_needed'] = value(max(required[i], 0.) / 100 * remaining_points[i])
+                entry['pace'] = value(pace[i])
+                entry['effort'] = value(required[i] - pace[i])
+                entry['reachable'] = bool(required[i] <= 100)
+            else:
+                entry['required_average'] = None
+                entry['points_needed'] = 0.
+                entry['pace'] = None
+                entry['effort'] = None
+                entry['reachable'] = bool(fixed[i] >= targets[course_id])
+            plan.append(entry)
+        plan.sort(key=lambda e: (e['effort'] == None, -(e['effort'] or 0.)))
+        return plan
+
+# == Dashboard (dashboard_report, pathway_db, write_dashboards, dashboards) ==
+
+    def dashboard_report(self, course_id: int, path: dict, ideal_score: float) -> dict:
+        """
+        Structured dashboard of a pathway, rendered by write_dashboards
+        {course_id, course_name, course_current_grade, ideal_score, groups_considered, groups_total,
+         groups: [{group_id, group_name, group_weight, group_current_grade, pathway_grade (None if not considered),
+                   avg_score_needed, remaining: [{assignment_id, assignment_name, points_possible, goal_points}]}]}
+        """
+        with self.snapshot(course_id) as model:
+            course_info = model.course # not self.dir, which a concurrent restage may have replaced
+            report = {}
+            report['course_id'] = course_id
+            report['course_name'] = course_info['course_name']
+            report['course_current_grade'] = course_info['course_current_grade']
+            report['ideal_score'] = ideal_score
+            report['groups_considered'] = len(path)
+            report['groups_total'] = len(course_info['grade_groups'])
+            report['groups'] = []
+            for id, info in course_info['grade_groups'].items():
+                group = {}
+                group['group_id'] = id
+                group['group_name'] = info['group_name']
+                group['group_weight'] = info['group_weight']
+                group['group_current_grade'] = info['group_current_grade']
+                group['pathway_grade'] = path.get(id) # groups without weight are left out of the pathway
+                group['avg_score_needed'] = None
+                group['remaining'] = []
+                if group['pathway_grade'] != None:
+                    _, remaining_assignments, avg_score_needed = self.group_progress(course_id, id, path[id])
+                    group['avg_score_needed'] = avg_score_needed
+                    for a in remaining_assignments:
+                        goal = a['points_possible'] * avg_score_needed / 100 if avg_score_needed != None else None
+                        group['remaining'].append({'assignment_id': a['assignment_id'], 'assignment_name': a['assignment_name'], 'points_possible': a['points_possible'], 'goal_points': goal})
+                report['groups'].append(group)
+            return report
+
+    def pathway_db(self, course_id: int, path: dict, ideal_score: float, stream=None) -> None:
+        """
+        Writes the text dashboard of a pathway to stream (stdout by default)
+        """
+        self.write_dashboards([self.dashboard_report(course_id, path, ideal_score)], stream if stream != None else sys.stdout)
 
+    def write_dashboards(self, reports: list, out=None, fmt='text'):
+        """
+        Renders dashboard reports with self.renderers[fmt] in one pass
+        out: a stream, a file path, or None to return the rendered string
+        """
+        renderer = self.renderers.get(fmt)
+        if renderer == None:
+            raise Exception(f"Unknown dashboard format {fmt}, expected one of {list(self.renderers)}")
+        if out == None:
+            buffer = io.StringIO()
+            renderer(reports, buffer)
+            return buffer.getvalue()
+        if isinstance(out, str):
+            with open(out, 'w', newline='', encoding='utf-8') as f:
+                renderer(reports, f)
         else:
-            raise Exception("Error in algorithm logic")
+            renderer(reports, out)
+
+    def dashboards(self, queries: list, out=None, fmt='text', engine='iterative', workers=None, processes=False):
+        """
+        Batch mode: pathway_parallel for the queries, then all their dashboards written to out with write_dashboards
+        """
+        queries = [(q[0], q[1], q[2] if len(q) > 2 else {}) for q in queries]
+        paths = self.pathway_parallel(queries, engine=engine, workers=workers, processes=processes)
+        reports = [self.dashboard_report(course_id, path, ideal_score) for (course_id, ideal_score, _), path in zip(queries, paths)]
+        return self.write_dashboards(reports, out, fmt)
+
+    def render_text(self, reports: list, stream) -> None:
+        lines = []
+        for report in reports:
+            lines.append("")
+            lines.append(f"== Dashboard for course \"{report['course_name']}\" ==")
+            lines.append("")
+            lines.append(f"  > {report['groups_considered']} Grade groups considered ({report['groups_total']} total)")
+            for group in report['groups']:
+                lines.append(f"    > {group['group_name']}: Current grade {group['group_current_grade']}% with weight of {group['group_weight']}%")
+                if group['pathway_grade'] == None:
+                    lines.append("      > Not considered by the pathway")
+                    continue
+                lines.append(f"      > Pathway grade calculated: {group['pathway_grade']}")
+                if len(group['remaining']) == 0:
+                    lines.append("      > No remaining assignments")
+                elif group['avg_score_needed'] == None: # pathway grade already reached
+                    lines.append(f"      > No score needed on {len(group['remaining'])} remaining assignments:")
+                else:
+                    lines.append(f"      > Avg score of {group['avg_score_needed']} needed on {len(group['remaining'])} remaining assignments:")
+                for a in group['remaining']:
+                    goal = "" if a['goal_points'] == None else f" (goal: {format(a['goal_points'], '.3f')} pts)"
+                    lines.append(f"        > {a['assignment_name']}, {a['points_possible']} pts possible.{goal}")
+            lines.append("")
+            lines.append("== End of Dashboard ==")
+        stream.write("\n".join(lines) + "\n")
+
+    def render_json(self, reports: list, stream) -> None:
+        """
+        One JSON report per line
+        """
+        stream.write("".join(json.dumps(report) + "\n" for report in reports))
+
+    def render_csv(self, reports: list, stream) -> None:
+        """
+        One row per remaining assignment (one row with empty assignment columns for groups without any)
+        """
+        writer = csv.writer(stream)
+        writer.writerow(['course_id', 'course_name', 'ideal_score', 'group_id', 'group_name', 'group_weight', 'group_current_grade', 'pathway_grade', 'avg_score_needed',
+                         'assignment_id', 'assignment_name', 'points_possible', 'goal_points'])
+        rows = []
+        for report in reports:
+            for group in report['groups']:
+                prefix = [report['course_id'], report['course_name'], report['ideal_score'], group['group_id'], group['group_name'], group['group_weight'],
+                          group['group_current_grade'], group['pathway_grade'], group['avg_score_needed']]
+                if len(group['remaining']) == 0:
+                    rows.append(prefix + [None, None, None, None])
+                for a in group['remaining']:
+                    rows.append(prefix + [a['assignment_id'], a['assignment_name'], a['points_possible'], None if a['goal_points'] == None else round(a['goal_points'], 3)])
+        writer.writerows(rows)
+
+    def render_html(self, reports: list, stream) -> None:
+        """
+        One <section> per report in a single HTML document
+        """
+        e = lambda x: '' if x == None else html.escape(str(x))
+        parts = ["<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Dashboards</title></head><body>\n"]
+        for report in reports:
+            parts.append(f"<section><h2>Dashboard for course {e(report['course_name'])}</h2>\n")
+            parts.append(f"<p>Target {e(report['ideal_score'])}%, {report['groups_considered']} grade groups considered ({report['groups_total']} total)</p>\n")
+            parts.append("<table><tr><th>Group</th><th>Weight</th><th>Current grade</th><th>Pathway grade</th><th>Avg score needed</th><th>Remaining assignments</th></tr>\n")
+            for group in report['groups']:
+                goal = lambda a: '' if a['goal_points'] == None else format(a['goal_points'], '.3f')
+                remaining = "".join(f"<li>{e(a['assignment_name'])}: {goal(a)} / {e(a['points_possible'])} pts</li>" for a in group['remaining'])
+                parts.append(f"<tr><td>{e(group['group_name'])}</td><td>{e(group['group_weight'])}%</td><td>{e(group['group_current_grade'])}</td>"
+                             f"<td>{e(group['pathway_grade'])}</td><td>{e(group['avg_score_needed'])}</td><td><ul>{remaining}</ul></td></tr>\n")
+            parts.append("</table></section>\n")
+        parts.append("</body></html>\n")
+        stream.write("".join(parts))
+
+# == Algorithm (recursive, solve, solve_batch, borderline, calc_borderline) == 
+
+    def recursive(self, course_id: int, groups: dict, set_groups: dict, test_groups: dict, low_outliers: list, high_outliers: list, ideal_score: float, less_than: bool, count=0, m=1, n=0.25, verbose=False, trace=None) -> dict:
+        """
+        Groups: group grades being modified
+        set_groups: group grades that are done being modified (can contain groups with finalized grades)
+        test_groups: group grades from user input (should contain groups with finalized grades), will not be touched
+        verbose: print every iteration, trace: PathwayTrace that records every iteration
+
+        Each step used to be a recursive call, it is now one pass of a loop so long searches don't hit the recursion limit
+        """
+        while True:
+            self.metrics.calls['recursive'] += 1
+            calculated_grade = self.calculate_grade(course_id, groups, set_groups, test_groups)
+            if verbose:
+                print(f"== Starting the {count}th iteration of the recursive function == ")
+                print(f"  > initial {groups}, set {set_groups}, test {test_groups}")
+                print(f'  > Calculated grade {calculated_grade}')
+
+            if len(groups) == 0:
+                if verbose:
+                    print(f"    > No more group grades able to be modified (all groups are finalized).")
+                if trace != None:
+                    trace.add(count, 'done', 'finalized', {}, calculated_grade)
+                return set_groups
+
+            if calculated_grade == ideal_score:
+                if verbose:
+                    print("      > Calculated grade equals ideal score")
+                if trace != None:
+                    trace.add(count, 'done', 'reached', {}, calculated_grade)
+                copy = groups.copy()
+                copy.update(set_groups)
+                copy.update(test_groups)
+                return copy
+
+            if (calculated_grade < ideal_score) & less_than: # coming from low end
+                direction = 'up'
+                if (len(high_outliers) > 1) & ((count % 2 == 0) | (len(low_outliers) == 0)): # Increase avgs for groups with high outliers by 'm'
+                    step, deltas = 'high outliers', self.step_groups(course_id, groups, set_groups, high_outliers, m, verbose)
+                elif (len(low_outliers) > 0) & ((count % 2 == 1) | (len(high_outliers) == 0)): # Increase avgs for groups with low outliers by 'n'
+                    step, deltas = 'low outliers', self.step_groups(course_id, groups, set_groups, low_outliers, n, verbose)
+                else: # increment by n for each group in groups (those where current grades == performance)
+                    step, deltas = 'all', self.step_all(course_id, groups, set_groups, n, verbose)
+                    if len(deltas) == 0: # no more adjustment can be made
+                        step = 'borderline'
+
+            elif (calculated_grade > ideal_score) & (not less_than): # coming from high end
+                direction = 'down'
+                if (len(low_outliers) > 0) & ((count % 2 == 0) | (len(high_outliers) == 0)): # Decrease avgs for groups with low outliers by 'm'
+                    step, deltas = 'low outliers', self.step_groups(course_id, groups, set_groups, low_outliers, -m, verbose)
+                    less_than = not less_than
+                elif (len(high_outliers) > 0) & ((count % 2 == 1) | (len(low_outliers) == 0)): # Decrease avgs for groups with high outliers by 'n'
+                    step, deltas = 'high outliers', self.step_groups(course_id, groups, set_groups, high_outliers, -n, verbose)
+                    less_than = not less_than
+                else: # decrement by n for each group in groups (those where current grades == performance)
+                    step, deltas = 'all', self.step_all(course_id, groups, set_groups, -n, verbose)
+                    if len(deltas) == 0: # no more adjustment can be made
+                        step = 'borderline'
+
+            else: # ideal score was crossed
+                direction, step, deltas = ('up' if less_than else 'down'), 'borderline', {}
+
+            if verbose:
+                print(f"    > {direction}: {step} {deltas}")
+            if trace != None:
+                trace.add(count, direction, step, deltas, calculated_grade)
+            if step == 'borderline':
+                return self.borderline(course_id, groups, set_groups, test_groups, ideal_score, calculated_grade)
+            count += 1
+
+    def step_groups(self, course_id: int, groups: dict, set_groups: dict, ids: list, adj: float, verbose=False) -> dict:
+        """
+        Moves the grades of the groups in ids by adj where possible,
+        groups that can't be moved are set and removed from ids
+        returns {group_id: adj} for the groups moved
+        """
+        deltas = {}
+        for id in ids.copy():
+            if id not in groups: # already set through the other outlier list
+                ids.remove(id)
+            elif self.grade_possible(course_id, id, groups[id], adj) == True:
+                groups[id] = groups[id] + adj # new grade is possible
+                deltas[id] = adj
+            else:
+                if verbose:
+                    print(f'      > New grade is not possible for {id} (prev grade {groups[id]}), set grade')
+                set_groups[id] = groups.pop(id) # group grade is set, should not be changed
+                ids.remove(id)
+        return deltas
+
+    def step_all(self, course_id: int, groups: dict, set_groups: dict, adj: float, verbose=False) -> dict:
+        """
+        Moves every group grade that still has remaining assignments by adj where possible
+        returns {group_id: adj} for the groups moved (empty when no adjustment can be made)
+        """
+        deltas = {}
+        for id in groups:
+            if self.grade_possible(course_id, id, groups[id], adj) == True:
+                groups[id] = groups[id] + adj
+                deltas[id] = adj
+            elif verbose:
+                print(f'      > Adjustment not possible for {id}')
+        for id in set_groups:
+            if len(self.model(course_id).groups[id].future) > 0:
+                if self.grade_possible(course_id, id, set_groups[id], adj) == True:
+                    set_groups[id] = set_groups[id] + adj
+                    deltas[id] = adj
+                elif verbose:
+                    print(f'      > Adjustment not possible for {id}')
+        return deltas
+
+    def solve(self, course_id: int, groups: dict, set_groups: dict, test_groups: dict, low_outliers: list, high_outliers: list, ideal_score: float, less_than: bool, m=1, n=0.25) -> dict:
+        """
+        One pass alternative to recursive with the same inputs
+        Every group in groups moves towards ideal_score at its own rate (m for outliers on the side being moved, like recursive, n otherwise),
+        clipped to its grade_bounds. The course grade is then piecewise linear in the step size t, so t is solved exactly between breakpoints.
+        Falls back to borderline when the ideal score can't be reached within the bounds.
+        Reaches the same course grade as recursive, not the same group grades: recursive moves one outlier list per step
+        (alternating, high outliers only while there are more than one) and coming from the high end takes a single step
+        before borderline spreads the rest evenly, while every group moves here at once. From the low end group grades
+        stay within a few points of recursive, from the high end outliers can end up tens of points lower.
+        """
+        self.metrics.calls['solve'] += 1
+        fixed = set_groups.copy()
+        fixed.update(test_groups)
+        ids = list(groups)
+        if len(ids) == 0:
+            return fixed
+
+        groups_model = self.model(course_id).groups
+        target = ideal_score - sum(groups_model[id].weight / 100 * grade for id, grade in fixed.items())
+        starts = np.array([[groups[id] for id in ids]], dtype=float)
+        grades, reached = self.solve_batch(course_id, ids, starts, np.array([target]), np.array([less_than]), low_outliers, high_outliers, m, n)
+
+        if not reached[0]:
+            saturated = dict(zip(ids, grades[0].tolist()))
+            path = self.borderline(course_id, saturated, set_groups, test_groups, ideal_score, self.calculate_grade(course_id, saturated, set_groups, test_groups))
+            return {id: grade if id in test_groups else float(format(grade, ".4f")) for id, grade in path.items()} # rounded like a reached path
+
+        path = {id: float(format(grade, ".4f")) for id, grade in zip(ids, grades[0])}
+        path.update(fixed)
+        return path
+
+    def solve_batch(self, course_id: int, ids: list, starts: np.ndarray, targets: np.ndarray, less_than: np.ndarray, low_outliers: list, high_outliers: list, m=1, n=0.25) -> tuple:
+        """
+        Vectorized core of solve for T searches over the same groups
+        starts: (T, groups) start grades, targets: (T,) weighted grade wanted from ids, less_than: (T,) coming from low end
+        ((T, groups) grades, (T,) target reached within bounds); rows not reached hold the grades saturated at their bounds
+        """
+        model = self.model(course_id)
+        positions = model.positions(ids)
+        weights = model.weights[positions] / 100
+        low, high = model.lowest[positions], model.highest[positions]
+        starts = np.clip(starts, low, high)
+        rows = np.arange(len(targets))
+
+        directions = np.where(less_than, 1., -1.)
+        rates_up = np.array([m if id in high_outliers else n for id in ids], dtype=float)
+        rates_down = np.array([m if id in low_outliers else n for id in ids], dtype=float)
+        rates = np.where(less_than[:, None], rates_up, rates_down)
+
+        # step sizes at which each group hits its bound, and the weighted grade at each of them
+        stops = np.abs(np.where(less_than[:, None], high, low) - starts) / rates
+        steps = np.sort(np.concatenate((np.zeros((len(targets), 1)), stops), axis=1), axis=1)
+        moved = np.clip(starts[:, None, :] + directions[:, None, None] * rates[:, None, :] * steps[:, :, None], low, high)
+        totals = moved @ weights
+        reached = directions[:, None] * (totals - targets[:, None]) >= 0
+        ok = reached.any(axis=1)
+
+        k = np.maximum(np.argmax(reached, axis=1), 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = steps[rows, k - 1] + (targets - totals[rows, k - 1]) / (totals[rows, k] - totals[rows, k - 1]) * (steps[rows, k] - steps[rows, k - 1])
+        t = np.where(ok, t, steps[:, -1])
+        t = np.where(reached[:, 0], 0., t) # the (clipped) start grades already meet the target
+        return (np.clip(starts + directions[:, None] * rates * t[:, None], low, high), ok)
 
     def borderline(self, course_id: int, groups: dict, set_groups: dict, test_groups: dict, ideal_score: float, calculated_grade: float) -> dict:
         all_groups = groups.copy()
@@ -317,14 +1450,12 @@ class B2A:
         score = ideal_score
         var = 0
 
+        groups = self.model(course_id).groups
         for id, grade in all_groups.items():
-            group_weight = self.dir[course_id]['grade_groups'][id]['group_weight'] / 100
-            if (len(self.dir[course_id]['grade_groups'][id]['assignments']['future']) > 0) & (id not in test_groups):
+            group_weight = groups[id].weight / 100
+            if (len(groups[id].future) > 0) & (id not in test_groups):
                 score -= group_weight * grade
-                if less_than:
-                    var += group_weight
-                else:
-                    var -= group_weight
+                var += group_weight # score is already negative when coming from the high end
             else:
                 score -= group_weight * grade
         
@@ -332,7 +1463,7 @@ class B2A:
         copy_groups = all_groups.copy()
 
         for id, grade in copy_groups.items():
-            if (len(self.dir[course_id]['grade_groups'][id]['assignments']['future']) > 0) & (id not in test_groups):
+            if (len(groups[id].future) > 0) & (id not in test_groups):
                 copy_groups[id] = copy_groups.get(id) + x
 
         return copy_groups
@@ -344,15 +1475,18 @@ class B2A:
         {group_id: ([not outliers], [low outliers], [high outliers])}
         automatically does not count groups where weight is zero and no more assignments
         returns none where there are no graded assignments
+        memoized until the course is restaged, the result must not be modified
         """
-        gg = self.dir[course_id]['grade_groups']
+        return self.memo(course_id, 'outliers', lambda: self._outliers_for_course(course_id))
+
+    def _outliers_for_course(self, course_id: int) -> dict:
+        model = self.model(course_id)
         group_grades = {}
-        for id, info in gg.items():
-            if (gg[id]['group_weight'] != 0) & (len(gg[id]['assignments']['future']) > 0):
+        for id, group in model.groups.items():
+            if (group.weight != 0) & (len(group.future) > 0):
                 assignment_grades = []
-                assignment_ids = info['assignments']['graded']
-                for a in assignment_ids:
-                    assignment_grades.append(self.assignments[course_id][a]['grade'])
+                for a in group.graded:
+                    assignment_grades.append(model.assignments[a]['grade'])
 
                 if len(assignment_grades) == 0:
                     group_grades[id] = None
@@ -361,18 +1495,20 @@ class B2A:
                     group_grades[id] = outliers
         return group_grades
 
-    def set_initial_group_grades(self, course_id: int, ideal_score: float) -> tuple:
+    def set_initial_group_grades(self, course_id: int, ideal_score: float, outliers=None) -> tuple:
         """
         ({group_id: avg % grade for no outliers scores}, {group_id: current % grade}, {group_id: (has low outliers, has high outliers)})
         if score was None, sets to ideal_score
+        outliers from outliers_for_course can be passed in when already computed
         """
-        outliers = self.outliers_for_course(course_id)
+        if outliers == None:
+            outliers = self.outliers_for_course(course_id)
+        groups = self.model(course_id).groups
         initial = {}
         set_group = {}
         has_low_high = {} # outliers
         for id, scores in outliers.items():
             assignments = outliers.get(id)
-            weight = self.dir[course_id]['grade_groups'][id]['group_weight']
             if assignments == None:
                 initial[id] = ideal_score
                 has_low_high[id] = (False, False)
@@ -385,12 +1521,12 @@ class B2A:
                 if self.group_progress(course_id, id, avg_no_outliers)[2] <= avg_no_outliers:
                     initial[id] = avg_no_outliers
                 else:
-                    initial[id] = self.dir[course_id]['grade_groups'][id]['group_current_grade']
+                    initial[id] = groups[id].current_grade
                 has_low_high[id] = (len(low) > 0, len(high) > 0)
 
-        for id, info in self.dir[course_id]['grade_groups'].items():
-            if (len(info['assignments']['future']) == 0) & (info['group_weight'] > 0):
-                set_group[id] = info['group_current_grade']
+        for id, group in groups.items():
+            if (len(group.future) == 0) & (group.weight > 0):
+                set_group[id] = group.current_grade
 
         return (initial, set_group, has_low_high)
 
@@ -408,41 +1544,122 @@ class B2A:
         min_grade = min(no_outliers)
         return (no_outliers, array[(array < min_grade) & (s >= m)].tolist(), array[(array > max_grade) & (s >= m)].tolist())
 
-    def grade_possible(self, course_id: int, group_id: int, grade: float, adj: float, diff=5.) -> bool:
+    def grade_possible(self, course_id: int, group_id: int, grade: float, adj: float, diff=GroupModel.DIFF) -> bool:
         """
         Grade is possible (returns true) if: 
         0 <= grade <= 100
-        grade < remaining_percent + diff
+        remaining_percent <= 100
+        remaining_percent <= grade + diff
+        where remaining_percent is the % needed on the remaining assignments for grade,
+        compared through the bounds precomputed in GroupModel (unrounded)
         """
-        max_pts = self.dir[course_id]['grade_groups'][group_id]['maximum_points']
-        scored_pts = self.dir[course_id]['grade_groups'][group_id]['scored_points']
-        possible_pts = self.dir[course_id]['grade_groups'][group_id]['possible_points']
-        remaining_percent = self.calculate_remaining_percentage_for_ideal(grade, max_pts, scored_pts, possible_pts)
+        self.metrics.calls['grade_possible'] += 1
+        group = self.model(course_id).groups[group_id]
 
         adjusted_grade = grade + adj
         if (adjusted_grade < 0) | (adjusted_grade > 100):
             return False
-        elif remaining_percent > 100:
+        elif grade > group.ceiling:
             return False
-        elif remaining_percent > (adjusted_grade + diff):
+        elif grade > group.base + group.rate * (adj + diff):
             return False
         else:
             return True
 
-# == Useful Stuff (group_progress, course_group_stats) == 
+    def grade_bounds(self, course_id: int, group_id: int, diff=GroupModel.DIFF) -> tuple:
+        """
+        (lowest achievable, highest allowed by grade_possible) group grade, precomputed at staging for the default diff
+        grade_possible itself only keeps grades above 0, lowest is tighter so the solver never asks for negative scores
+        """
+        group = self.model(course_id).groups[group_id]
+        if diff == GroupModel.DIFF:
+            return (group.lowest, group.highest)
+        return (group.lowest, group.upper(diff))
+
+# == Useful Stuff (model, memo, group_progress, course_group_stats, group_assignment_lists) == 
+
+    def model(self, course_id: int) -> CourseModel:
+        """
+        CourseModel of a staged course: the one pinned to this thread by snapshot, otherwise the latest one
+        compiled from self.dir on first use if staging didn't build it
+        """
+        pinned = getattr(self.local, 'pinned', None)
+        if (pinned != None) and (pinned[0] == course_id):
+            return pinned[1]
+        model = self.models.get(course_id)
+        if model == None:
+            model = CourseModel(self.dir[course_id]['grade_groups'], self.assignments[course_id], self.dir[course_id])
+            self.models[course_id] = model
+        return model
+
+    @contextmanager
+    def snapshot(self, course_id: int, model=None):
+        """
+        with b.snapshot(course_id) as model: everything this thread reads of the course comes from model,
+        even if the course is restaged, refreshed or unstaged by another thread meanwhile
+        model: pin this CourseModel (taken earlier, e.g. under a caller's lock) instead of the current one
+        """
+        previous = getattr(self.local, 'pinned', None)
+        model = model if model != None else self.model(course_id)
+        self.local.pinned = (course_id, model)
+        try:
+            yield model
+        finally:
+            self.local.pinned = previous
+
+    def memo(self, course_id: int, key, compute):
+        """
+        compute() memoized in the course's CourseModel under key
+        """
+        memo = self.model(course_id).memo
+        try:
+            value = memo[key] # one lookup, another thread may clear the memo between a check and a read
+            self.memo_hits += 1
+            return value
+        except KeyError:
+            pass
+        self.memo_misses += 1
+        value = compute()
+        if len(memo) >= self.memo_size:
+            memo.clear()
+        memo[key] = value
+        return value
+
+    def invalidate_memo(self, course_id=None) -> None:
+        """
+        Drops the memoized stats of one course (all courses if None)
+        restaging already starts from an empty memo
+        """
+        models = list(self.models.values()) if course_id == None else [self.models.get(course_id)]
+        for model in models:
+            if model != None:
+                model.memo.clear()
+
+    def memo_stats(self) -> dict:
+        calls = self.memo_hits + self.memo_misses
+        stats = {}
+        stats['hits'] = self.memo_hits
+        stats['misses'] = self.memo_misses
+        stats['hit_rate'] = self.memo_hits / calls if calls > 0 else None
+        stats['entries'] = {course_id: len(model.memo) for course_id, model in list(self.models.items())}
+        return stats
 
     def group_progress(self, course_id: int, group_id: int, ideal_score: float):
         """
         (current grade, [assignments to go], avg score needed on remaining assignments)
         ideal score is % for group
+        memoized until the course is restaged, the result must not be modified
         """
-        group_info = self.dir[course_id]['grade_groups'][group_id]
-        name = group_info['group_name']
-        current_grade = group_info['group_current_grade']
-        future = group_info['assignments']['future']
-        points_maximum = group_info['maximum_points']
-        points_scored = group_info['scored_points']
-        points_possible = group_info['possible_points']
+        return self.memo(course_id, ('progress', group_id, ideal_score), lambda: self._group_progress(course_id, group_id, ideal_score))
+
+    def _group_progress(self, course_id: int, group_id: int, ideal_score: float):
+        model = self.model(course_id)
+        group = model.groups[group_id]
+        current_grade = group.current_grade
+        future = group.future
+        points_maximum = group.maximum
+        points_scored = group.scored
+        points_possible = group.possible
 
         if points_maximum == points_possible:
             return (current_grade, [], None)
@@ -451,7 +1668,7 @@ class B2A:
         
         for a_id in future:
             a_info = {}
-            assignment = self.assignments[course_id][a_id]
+            assignment = model.assignments[a_id]
             a_info['assignment_id'] = a_id
             a_info['assignment_name'] = assignment['name']
             a_info['points_possible'] = assignment['points_possible']
@@ -461,26 +1678,84 @@ class B2A:
         remaining_percentage = self.calculate_remaining_percentage_for_ideal(ideal_score, points_maximum, points_scored, points_possible)
         return (current_grade, a_list, remaining_percentage)
 
-    def course_group_stats(self, course_id: int, group_id: int) -> tuple:
+    def course_group_stats(self, course_id: int, group_id: int, assignments=None) -> tuple:
         """
         (scored: int, possible: int, maximum: int, assignments: list) 
         current course group grade calculated from scored and possible
+        assignments are fetched per assignment if not already given
         """
-        assignments = self.assignments_for_course_by_grade_group(course_id, group_id)
-        df = pd.DataFrame(assignments)
-        df = df.replace({np.nan: None})
-        maximum = df['points_possible'].sum()
-        df = df[df['score'].isna() == False]
-        if len(df) == 0:
+        if assignments == None:
+            assignments = self.assignments_for_course_by_grade_group(course_id, group_id)
+        maximum = sum(a['points_possible'] for a in assignments if a['points_possible'] != None)
+        scored_a = [a for a in assignments if a['score'] != None]
+        if len(scored_a) == 0:
             return (0, 0, maximum, assignments)
-        else:
-            possible = df['points_possible'].sum()
-            if possible == None:
-                possible = 0
-            scored = df['score'].sum()
-            if scored == None:
-                scored = 0
-            return (scored, possible, maximum, assignments)
+        possible = sum(a['points_possible'] for a in scored_a if a['points_possible'] != None)
+        scored = sum(a['score'] for a in scored_a)
+        return (scored, possible, maximum, assignments)
+
+    def group_assignment_lists(self, group_assignments: list) -> dict:
+        """
+        {'graded': [ids], 'future': [ids], 'ungraded': [ids]} for a group's staged assignments
+        """
+        graded_a = [d['assignment_id'] for d in group_assignments if (d['score'] != None) & (d['percent_of_total_grade'] > 0)]
+        future_a = [d['assignment_id'] for d in group_assignments if (d['score'] == None) & (d['percent_of_total_grade'] > 0)]
+        ungraded_a = [d['assignment_id'] for d in group_assignments if (d['points_possible'] == 0) | (d['percent_of_total_grade'] == 0) | (d['percent_of_total_grade'] == None)]
+
+        a_dict = {}
+        a_dict['graded'] = graded_a
+        a_dict['future'] = future_a
+        a_dict['ungraded'] = ungraded_a
+        return a_dict
+
+# == Instrumentation (summary, profile) ==
+
+    def summary(self) -> dict:
+        """
+        {requests, phases, calls, pathway_stats, pathways (the last ones)} collected by self.metrics, plus request counts per staged course
+        """
+        summary = self.metrics.summary()
+        summary['stage_requests'] = dict(self.stage_requests)
+        summary['memo'] = self.memo_stats()
+        return summary
+
+    def profile(self, fn, *args, path=None, **kwargs) -> tuple:
+        """
+        Runs one call (a B2A method name or any callable) under cProfile
+        (result, pstats.Stats), the raw profile is also dumped to path if given
+        """
+        if isinstance(fn, str):
+            fn = getattr(self, fn)
+        profiler = cProfile.Profile()
+        result = profiler.runcall(fn, *args, **kwargs)
+        if path != None:
+            profiler.dump_stats(path)
+        return (result, pstats.Stats(profiler))
+
+# == Export (courses_frame, assignments_frame) ==
+
+    def courses_frame(self):
+        """
+        all_courses() as a pandas DataFrame (pandas is only imported for exports)
+        """
+        import pandas as pd
+        return pd.DataFrame(self.all_courses())
+
+    def assignments_frame(self, course_id: int):
+        """
+        Staged assignments of a course as a pandas DataFrame, one row per assignment with its group
+        """
+        import pandas as pd
+        rows = []
+        for group_id, info in self.dir[course_id]['grade_groups'].items():
+            for a_ids in info['assignments'].values():
+                for a_id in a_ids:
+                    row = dict(self.assignments[course_id][a_id])
+                    row['assignment_id'] = a_id
+                    row['group_id'] = group_id
+                    row['group_name'] = info['group_name']
+                    rows.append(row)
+        return pd.DataFrame(rows).drop_duplicates('assignment_id')
 
 # == Standard Calculations (calculate_percentage, calculate_remaining_percentage_for_ideal, calculate_grade) == 
 
@@ -491,7 +1766,6 @@ class B2A:
         return float(percentage_str)
 
     def calculate_remaining_percentage_for_ideal(self, ideal_score: float, max_pts: float, scored_pts: float, possible_pts: float) -> float:
-        decimals = str(scored_pts)[::-1].find('.')
         points_needed = float(format((ideal_score / 100) * max_pts - scored_pts, ".3f"))
         return self.calculate_percentage(points_needed, max_pts - possible_pts) 
 
@@ -501,24 +1775,44 @@ class B2A:
 
         groups - {group_id: % grade}
         """
+        self.metrics.calls['calculate_grade'] += 1
         sum = 0
         copy = groups.copy()
         copy.update(set_groups)
         copy.update(test_groups)
 
+        groups = self.model(course_id).groups
         for id, grade in copy.items():
-            gg = self.dir[course_id]['grade_groups'].get(id, None)
-            if gg == None:
+            group = groups.get(id, None)
+            if group == None:
                 raise Exception(f"Unknown group id {id}")
-            sum = sum + (grade / 100) * gg['group_weight']
+            sum = sum + (grade / 100) * group.weight
 
         return float(format(sum, ".3f"))
 
-# == Canvas (all_courses, all_grade_groups_for_course, assignments_for_course_by_grade_group, get_assignment_grade_for_course) ==
+# == Canvas (course_index, invalidate_courses, all_courses, all_grade_groups_for_course, assignments_for_course, submissions_for_course, assignments_for_course_by_grade_group, get_assignment_grade_for_course) ==
+
+    def course_index(self, refresh=False) -> dict:
+        """
+        {course_id: {course_name, course_weights, course_current_score, access_removed}}
+        all_courses() is only fetched again once course_ttl has passed, or with refresh=True (revalidating any cached response)
+        """
+        with self.index_lock:
+            if refresh or (self.courses == None) or (time.monotonic() - self.courses_fetched > self.course_ttl):
+                self.courses = {c['course_id']: c for c in self.all_courses(revalidate=refresh)}
+                self.courses_fetched = time.monotonic()
+            return self.courses
+
+    def invalidate_courses(self) -> None:
+        """
+        Forgets the course index, the next course_index() call fetches all_courses again
+        """
+        with self.index_lock:
+            self.courses = None
 
-    def all_courses(self) -> list:
+    def all_courses(self, revalidate=False) -> list:
         L = [] # stores list of course dictionaries
-        r = self.pagination(f"https://{self.url}/api/v1/users/self/courses?include[]=total_scores&per_page=50")
+        r = self.items(f"https://{self.url}/api/v1/users/self/courses?include[]=total_scores&per_page=50", revalidate=revalidate)
         for course in r:
             try:
                 infos = {} # fill with name, weights, current_score
@@ -557,10 +1851,78 @@ class B2A:
             L.append(infos)
         return L
 
+    def assignments_for_course(self, course_id: int, submissions=True) -> tuple:
+        """
+        ([grade groups], {group_id: [assignments]})
+        bulk version of all_grade_groups_for_course + assignments_for_course_by_grade_group,
+        groups come with their assignments and are joined with all submissions in memory
+        submissions=False skips the user's submissions (grade and score are None)
+        """
+        def read_groups() -> tuple:
+            # raw pages (with assignment descriptions) are dropped as soon as they are read
+            groups = []
+            assignments = {}
+            for group in self.items(f"https://{self.url}/api/v1/courses/{course_id}/assignment_groups?include[]=assignments&per_page=50"):
+                infos = {}
+                infos['course_id'] = course_id
+                infos['group_id'] = group['id']
+                infos['group_name'] = group['name']
+                infos['group_weight'] = group['group_weight']
+                groups.append(infos)
+
+                L = []
+                for a in group.get('assignments', []):
+                    info = {}
+                    info['course_id'] = course_id
+                    info['assignment_id'] = a['id']
+                    info['assignment_name'] = a['name']
+                    info['group_id'] = a['assignment_group_id']
+                    info['points_possible'] = a['points_possible']
+                    info['grade'] = None
+                    info['score'] = None
+                    info['due_at'] = a['due_at']
+                    L.append(info)
+                assignments[group['id']] = L
+            return (groups, assignments)
+
+        if submissions:
+            (groups, assignments), submissions = self.parallel(lambda fetch: fetch(), [read_groups, lambda: self.submissions_for_course(course_id)])
+        else:
+            (groups, assignments), submissions = read_groups(), {}
+
+        for L in assignments.values():
+            for info in L:
+                submission = submissions.get(info['assignment_id'])
+                if submission != None:
+                    info['grade'] = submission['grade']
+                    info['score'] = submission['score']
+        return (groups, assignments)
+
+    def submissions_for_course(self, course_id: int, graded_since=None) -> dict:
+        """
+        {assignment_id: submission} for every submission of the user in the course
+        graded_since (ISO 8601) limits it to submissions graded after that time
+        """
+        path = f"https://{self.url}/api/v1/courses/{course_id}/students/submissions?student_ids[]=self&per_page=100"
+        if graded_since != None:
+            path += f"&graded_since={graded_since}"
+        r = self.items(path)
+        D = {}
+        for s in r:
+            d = {}
+            d['course_id'] = course_id
+            d['assignment_id'] = s['assignment_id']
+            d['grade'] = s['grade']
+            d['score'] = s['score']
+            d['state'] = s['workflow_state']
+            D[s['assignment_id']] = d
+        return D
+
     def assignments_for_course_by_grade_group(self, course_id: int, group_id: int) -> list:
         r = self.pagination(f"https://{self.url}/api/v1/courses/{course_id}/assignment_groups/{group_id}/assignments")
+        grade_requests = self.parallel(lambda a: self.get_assignment_grade_for_course(course_id, a['id']), r)
         L = []
-        for a in r:
+        for a, grade_request in zip(r, grade_requests):
             info = {}
             assignment_id = a['id']
             assignment_group_id = a['assignment_group_id']
@@ -568,8 +1930,6 @@ class B2A:
             assignment_name = a['name']
             points_possible = a['points_possible']
 
-            grade_request = self.get_assignment_grade_for_course(course_id, assignment_id)
-
             info['course_id'] = course_id
             info['assignment_id'] = assignment_id
             info['assignment_name'] = assignment_name
@@ -593,57 +1953,217 @@ class B2A:
         d['state'] = r['workflow_state']
         return d
 
-# == GET (get_request, pagination) ==
+# == GET (get_request, pagination, items, pages, get, parallel) ==
 
     def get_request(self, path: str) -> json:
-        r = requests.get(path, headers={'Authorization': "Bearer " + self.user})
-        if r.status_code != 200:
-            raise Exception("Error in establishing GET request.")
-        return r.json()
+        return self.get(path).json()
 
     def pagination(self, path: str) -> list:
-        headers = {'Authorization': "Bearer " + self.user}
-        r = requests.get(path, headers=headers)
-        if r.status_code != 200:
-            raise Exception("Error in establishing GET request.")
+        """
+        Every item of a paginated request as one list, prefer items() to stream them
+        """
         data = []
-        raw = r.json()
-        for item in raw:
-            data.append(item)
-
-        while r.links['current']['url'] != r.links['last']['url']:
-            r = requests.get(r.links['next']['url'], headers=headers)
-            raw = r.json()
+        for raw in self.pages(path, prefetch=False):
             for item in raw:
                 data.append(item)
         return data
 
+    def items(self, path: str, prefetch=True, revalidate=False):
+        """
+        Yields the items of a paginated request one by one, see pages()
+        """
+        for raw in self.pages(path, prefetch, revalidate):
+            yield from raw
 
+    def pages(self, path: str, prefetch=True, revalidate=False):
+        """
+        Yields the items of a paginated request one page at a time
+        prefetch: the next page is requested in the background while the current one is processed
+        stopping early (break / closing the generator) cancels the prefetch if it hasn't started yet,
+        a prefetch already in flight still completes (at most one extra request), no further pages are requested
+        revalidate: see get
+        """
+        r = self.get(path, revalidate)
+        while True:
+            next_page = None
+            if prefetch and ('next' in r.links):
+                next_page = self.submit(self.get, r.links['next']['url'], revalidate)
+            try:
+                yield r.json()
+            except GeneratorExit: # closed early (break / garbage collected)
+                if next_page != None:
+                    next_page.cancel() # no-op once it has started
+                raise
+            if next_page != None:
+                r = next_page.result()
+            elif 'next' in r.links:
+                r = self.get(r.links['next']['url'], revalidate)
+            else:
+                return
 
+    def get(self, path: str, revalidate=False) -> requests.Response:
+        """
+        GET through the pooled session
+        retries with exponential backoff (plus jitter) on connection errors, timeouts, 429, 5xx and Canvas throttling (403 Rate Limit Exceeded)
+        served from / revalidated against self.cache when one is set
+        revalidate: always ask Canvas, even when the cached entry is still fresh (a 304 still serves it)
+        """
+        cached = None
+        headers = {}
+        if self.cache != None:
+            key = self.cache.key(self.user, path)
+            cached, fresh = self.cache.lookup(key)
+            if fresh and not revalidate:
+                return cached
+            if cached != None:
+                headers = self.cache.validators(cached)
+
+        for attempt in range(self.retries + 1):
+            self.throttle()
+            self.count_request()
+            start = time.perf_counter()
+            try:
+                with self.limit:
+                    r = self.session.get(path, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.metrics.record_request(path, time.perf_counter() - start, 0, None)
+                if attempt == self.retries:
+                    reason = 'timed out' if isinstance(e, requests.Timeout) else 'connection failed'
+                    raise CanvasError(f"Error in establishing GET request ({reason}): {path}")
+                time.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+                continue
+
+            self.metrics.record_request(path, time.perf_counter() - start, len(r.content), r.status_code)
+            self.update_rate_limit(r)
+            if (r.status_code == 304) & (cached != None):
+                self.cache.revalidated(key)
+                return cached
+            if r.status_code == 200:
+                if self.cache != None:
+                    self.cache.store(key, r)
+                return r
+
+            throttled = (r.status_code == 403) & ('Rate Limit Exceeded' in r.text)
+            if ((r.status_code == 429) | (r.status_code >= 500) | throttled) & (attempt < self.retries):
+                delay = self.backoff * 2 ** attempt * (1 + random.random())
+                retry_after = r.headers.get('Retry-After')
+                if (retry_after != None) and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                time.sleep(delay)
+                continue
+            raise CanvasError(f"Error in establishing GET request ({r.status_code}): {path}", r.status_code)
+
+    def update_rate_limit(self, r: requests.Response) -> None:
+        remaining = r.headers.get('X-Rate-Limit-Remaining')
+        cost = r.headers.get('X-Request-Cost')
+        with self.lock:
+            if remaining != None:
+                self.rate_limit_remaining = float(remaining)
+            if cost != None:
+                self.request_cost = float(cost)
+
+    def throttle(self) -> None:
+        """
+        Canvas refills the rate limit bucket over time; the closer it is to empty, the longer each request waits
+        """
+        if self.rate_limiter != None:
+            self.rate_limiter.wait()
+        remaining = self.rate_limit_remaining
+        if (remaining == None) or (remaining >= self.throttle_below):
+            return
+        pressure = 1 - max(remaining, 0) / self.throttle_below
+        time.sleep(self.backoff * pressure * max(self.request_cost, 1.))
+
+    def count_request(self) -> None:
+        with self.lock:
+            self.request_count += 1
+            counter = getattr(self.local, 'counter', None)
+            if counter != None:
+                counter[0] += 1
+
+    def submit(self, fn, *args):
+        """
+        Runs fn(*args) on the shared background pool, requests made count towards the course being staged
+        """
+        counter = getattr(self.local, 'counter', None)
 
+        def run():
+            self.local.counter = counter
+            return fn(*args)
 
+        with self.lock:
+            if self.background == None:
+                self.background = ThreadPoolExecutor(max_workers=self.workers)
+        return self.background.submit(run)
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    def parallel(self, fn, items: list) -> list:
+        """
+        [fn(item) for item in items], run on a thread pool of self.workers threads
+        results keep the order of items, so callers build the same dicts as a serial loop
+        """
+        items = list(items)
+        if (self.workers <= 1) | (len(items) <= 1):
+            return [fn(item) for item in items]
+        counter = getattr(self.local, 'counter', None)
+
+        def run(item):
+            self.local.counter = counter # requests made by helper threads count towards the staging course
+            return fn(item)
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items))) as executor:
+            return list(executor.map(run, items))
+
+# == Process workers (_pathway_worker_init, _pathway_worker, _clipped_moments, _simulate_trials) ==
+
+_worker = None # B2A of a pathway_parallel worker process
+
+def _pathway_worker_init(staged: dict) -> None:
+    """
+    Stages {course_id: (self.dir entry, self.assignments entry)} in a B2A of this worker process
+    """
+    global _worker
+    _worker = B2A('', '', workers=1)
+    for course_id, (course_info, assignments) in staged.items():
+        _worker.publish(course_id, course_info, assignments)
+
+def _pathway_worker(query: tuple) -> dict:
+    course_id, ideal_score, test_groups, engine = query
+    return _worker.pathway(course_id, ideal_score, test_groups, engine=engine, dashboard=False)
+
+def _clipped_moments(mean: float, std: float) -> tuple:
+    """
+    (mean, variance) of normal(mean, std) clipped to 0-100
+    """
+    if std <= 0:
+        return (min(100., max(0., mean)), 0.)
+    cdf = lambda z: 0.5 * (1 + math.erf(z / math.sqrt(2)))
+    pdf = lambda z: math.exp(-z * z / 2) / math.sqrt(2 * math.pi)
+    a = -mean / std
+    b = (100 - mean) / std
+    inside = cdf(b) - cdf(a)
+    first = mean * inside + std * (pdf(a) - pdf(b)) + 100 * (1 - cdf(b))
+    second = (mean**2 + std**2) * inside + 2 * mean * std * (pdf(a) - pdf(b)) + std**2 * (a * pdf(a) - b * pdf(b)) + 100**2 * (1 - cdf(b))
+    return (first, max(0., second - first**2))
+
+def _simulate_trials(params: dict, trials: int, seed, batch=4096, exact_below=32) -> np.ndarray:
+    """
+    (trials,) final % course grades for B2A.simulation_model params
+    remaining assignment scores are drawn from normal(mean, std) clipped to 0-100%, batch trials at a time;
+    groups with exact_below or more remaining assignments draw their total points at once instead,
+    from the normal with the mean and variance of that sum (central limit theorem)
+    """
+    rng = np.random.default_rng(seed)
+    grades = np.full(trials, params['fixed'])
+    for start in range(0, trials, batch):
+        n = min(batch, trials - start)
+        for weight, scored, maximum, mean, std, points in params['groups']:
+            if len(points) < exact_below:
+                percents = np.clip(mean + std * rng.standard_normal((n, len(points)), dtype=np.float32), 0, 100)
+                earned = percents @ points / 100
+            else:
+                clipped_mean, clipped_var = _clipped_moments(mean, std)
+                total = float(points.sum())
+                spread = math.sqrt(clipped_var * float(points @ points)) / 100
+                earned = np.clip(clipped_mean * total / 100 + spread * rng.standard_normal(n), 0, total)
+            grades[start:start + n] += weight * (scored + earned) / maximum
+    return grades
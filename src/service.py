@@ -0,0 +1,264 @@
+import os
+import json
+import pickle
+import argparse
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from canvas import B2A, CanvasError
+
+# == Service (NotFound, GradeService) ==
+
+class NotFound(Exception):
+    """
+    Course that isn't staged in the service (HTTP 404)
+    """
+
+class GradeService:
+    """
+    Keeps staged courses of one B2A resident in an LRU bounded by course count and memory,
+    answers grade/group/pathway queries from them and keeps them current with a B2A Watcher
+    self.lock only guards the LRU: Canvas fetches run without it (one at a time per course, see ensure)
+    and queries read the immutable CourseModel they took under it, so an eviction meanwhile doesn't affect them
+    """
+    def __init__(self, b2a: B2A, max_courses=50, max_bytes=256 * 2**20, refresh_interval=300.) -> None:
+        self.b2a = b2a
+        self.max_courses = max_courses
+        self.max_bytes = max_bytes
+        self.refresh_interval = refresh_interval
+        self.lock = threading.RLock()
+        self.resident = OrderedDict() # {course_id: approximate bytes}, least recently used first
+        self.staging = {} # {course_id: Lock} of cold courses being staged
+        self.watcher = None
+
+    def course_bytes(self, course_id: int) -> int:
+        """
+        Approximate memory of a staged course (size of its pickled staged state)
+        """
+        return len(pickle.dumps((self.b2a.dir[course_id], self.b2a.assignments[course_id])))
+
+    def stage(self, course_id: int) -> dict:
+        self.load(course_id)
+        return self.course(course_id)
+
+    def load(self, course_id: int) -> None:
+        """
+        (Re)stages the course from Canvas without self.lock (B2A.publish swaps it in), then makes it resident
+        """
+        self.b2a.stage_course(course_id)
+        with self.lock:
+            if course_id not in self.b2a.dir: # unstaged meanwhile
+                raise NotFound(f"Course {course_id} is not staged.")
+            self.resident[course_id] = self.course_bytes(course_id)
+            self.resident.move_to_end(course_id)
+            self.evict()
+
+    def ensure(self, course_id: int) -> None:
+        """
+        Stages the course on first use, otherwise marks it as recently used
+        concurrent queries for the same cold course wait for one fetch, queries for other courses aren't blocked
+        """
+        with self.lock:
+            if course_id in self.resident:
+                self.resident.move_to_end(course_id)
+                return
+            staging = self.staging.setdefault(course_id, threading.Lock())
+        with staging:
+            with self.lock:
+                if course_id in self.resident: # staged by the query we waited for
+                    return
+            try:
+                self.load(course_id)
+            finally:
+                with self.lock:
+                    self.staging.pop(course_id, None)
+
+    def model(self, course_id: int):
+        """
+        CourseModel of a resident course (staged on first use), still valid if the course is evicted afterwards
+        """
+        while True:
+            self.ensure(course_id)
+            with self.lock:
+                if course_id in self.resident: # else evicted right after staging, stage it again
+                    return self.b2a.model(course_id)
+
+    def evict(self) -> None:
+        with self.lock:
+            while (len(self.resident) > 1) & ((len(self.resident) > self.max_courses) | (sum(self.resident.values()) > self.max_bytes)):
+                course_id, _ = self.resident.popitem(last=False)
+                self.b2a.unstage_course(course_id)
+
+    def unstage(self, course_id: int) -> None:
+        with self.lock:
+            if course_id not in self.b2a.dir:
+                raise NotFound(f"Course {course_id} is not staged.")
+            self.resident.pop(course_id, None)
+            self.b2a.unstage_course(course_id)
+
+    def courses(self) -> list:
+        with self.lock:
+            return [{'course_id': id, 'course_name': self.b2a.dir[id]['course_name'], 'bytes': size, 'synced': self.b2a.synced.get(id)} for id, size in self.resident.items()]
+
+    def course(self, course_id: int) -> dict:
+        info = self.model(course_id).course
+        return {'course_id': course_id, 'course_name': info['course_name'], 'course_current_grade': info['course_current_grade'], 'synced': self.b2a.synced.get(course_id)}
+
+    def groups(self, course_id: int) -> list:
+        L = []
+        for id, info in self.model(course_id).course['grade_groups'].items():
+            group = {}
+            group['group_id'] = id
+            group['group_name'] = info['group_name']
+            group['group_weight'] = info['group_weight']
+            group['group_current_grade'] = info['group_current_grade']
+            group['remaining_assignments'] = len(info['assignments']['future'])
+            L.append(group)
+        return L
+
+    def pathway(self, course_id: int, ideal_score: float, engine='solver') -> dict:
+        model = self.model(course_id) # pinned below, so an eviction meanwhile doesn't matter
+        with self.b2a.snapshot(course_id, model):
+            path = self.b2a.pathway(course_id, ideal_score, engine=engine, dashboard=False)
+            groups = {}
+            for id, grade in path.items():
+                _, remaining, avg_needed = self.b2a.group_progress(course_id, id, grade)
+                groups[id] = {'group_grade': grade, 'avg_score_needed': avg_needed, 'remaining_assignments': len(remaining)}
+        return {'course_id': course_id, 'ideal_score': ideal_score, 'engine': engine, 'groups': groups}
+
+    def resident_ids(self) -> list:
+        with self.lock:
+            return list(self.resident)
+
+    def changed(self, course_id: int, action: str) -> None:
+        """
+        Watcher callback after a course was patched or restaged
+        """
+        with self.lock:
+            if course_id in self.resident:
+                self.resident[course_id] = self.course_bytes(course_id)
+                self.evict()
+            elif course_id in self.b2a.dir: # evicted while it was being checked
+                self.b2a.unstage_course(course_id)
+
+    def start(self) -> None:
+        """
+        Starts watching the resident courses for new grades in the background
+        """
+        self.watcher = self.b2a.watch(interval=self.refresh_interval, courses=self.resident_ids, on_change=self.changed)
+
+    def close(self) -> None:
+        if self.watcher != None:
+            self.watcher.stop()
+
+# == HTTP (make_handler, main) ==
+
+def make_handler(service: GradeService):
+    """
+    JSON routes:
+    GET  /courses                                   resident courses
+    GET  /courses/<id>                              current course grade (stages on first use)
+    GET  /courses/<id>/groups                       group grades and remaining assignments
+    GET  /courses/<id>/pathway?target=90&engine=    group grades needed for a target score
+    POST /courses/<id>/stage                        (re)stage from Canvas
+    POST /courses/<id>/unstage                      drop from memory
+    GET  /metrics                                   B2A.summary()
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def respond(self, status: int, body) -> None:
+            data = json.dumps(body, default=str).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def route(self, method: str) -> None:
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split('/') if p != '']
+            query = parse_qs(url.query)
+            if (method == 'GET') & (parts == ['courses']):
+                return self.answer(lambda: service.courses())
+            if (method == 'GET') & (parts == ['metrics']):
+                with service.lock:
+                    return self.answer(lambda: service.b2a.summary())
+            if (len(parts) < 2) or (len(parts) > 3) or (parts[0] != 'courses'):
+                return self.respond(404, {'error': 'Not found'})
+
+            action = parts[2] if len(parts) > 2 else None
+            try:
+                course_id = int(parts[1])
+                if action == 'pathway':
+                    target = float(query['target'][0])
+                    engine = query.get('engine', ['solver'])[0]
+                    if engine not in ('iterative', 'solver'):
+                        raise ValueError(f"unknown engine {engine}")
+            except (KeyError, ValueError) as e:
+                return self.respond(400, {'error': f"Bad request: {e}"})
+
+            if (method == 'GET') & (action == None):
+                return self.answer(lambda: service.course(course_id))
+            if (method == 'GET') & (action == 'groups'):
+                return self.answer(lambda: service.groups(course_id))
+            if (method == 'GET') & (action == 'pathway'):
+                return self.answer(lambda: service.pathway(course_id, target, engine))
+            if (method == 'POST') & (action == 'stage'):
+                return self.answer(lambda: service.stage(course_id))
+            if (method == 'POST') & (action == 'unstage'):
+                return self.answer(lambda: service.unstage(course_id) or {'course_id': course_id})
+            return self.respond(404, {'error': 'Not found'})
+
+        def answer(self, fn) -> None:
+            """
+            Responds with fn()'s result, or the status matching its error:
+            404/403 for courses Canvas doesn't give access to or that aren't staged, 502 for other Canvas errors, 500 otherwise
+            """
+            try:
+                return self.respond(200, fn())
+            except CanvasError as e:
+                return self.respond(e.status_code if e.status_code in (403, 404) else 502, {'error': str(e)})
+            except NotFound as e:
+                return self.respond(404, {'error': str(e)})
+            except Exception as e:
+                return self.respond(500, {'error': f"Internal error: {e}"})
+
+        def do_GET(self) -> None:
+            self.route('GET')
+
+        def do_POST(self) -> None:
+            self.route('POST')
+
+    return Handler
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve grades and pathways of staged Canvas courses over HTTP/JSON.")
+    parser.add_argument('--domain', required=True, help="Canvas domain, e.g. canvas.school.edu")
+    parser.add_argument('--token', default=os.environ.get('CANVAS_TOKEN'), help="API token (default: $CANVAS_TOKEN)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--courses', type=int, nargs='*', default=[], help="courses to stage at startup")
+    parser.add_argument('--max-courses', type=int, default=50)
+    parser.add_argument('--max-mb', type=float, default=256)
+    parser.add_argument('--refresh', type=float, default=300, help="seconds between checks for new grades")
+    args = parser.parse_args()
+    if args.token == None:
+        parser.error("an API token is required (--token or $CANVAS_TOKEN)")
+
+    service = GradeService(B2A(args.domain, args.token), args.max_courses, int(args.max_mb * 2**20), args.refresh)
+    for course_id in args.courses:
+        service.stage(course_id)
+    service.start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Serving grades on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        server.server_close()
+
+if __name__ == '__main__':
+    main()